@@ -0,0 +1,74 @@
+import time
+import types
+
+from bson.objectid import ObjectId
+
+from renderable_core.models import TaskMessage, JobMessage, ContainerMessage
+from renderable_core.services.codec import msgpack, MessagePackCodec, MessageCodec
+
+
+def measure(codec, model, message, count):
+  body, content_type, headers = codec.encode(message)
+  properties = types.SimpleNamespace(content_type = content_type, headers = headers)
+
+  start_time = time.perf_counter()
+
+  for _ in range(count):
+    codec.encode(message)
+
+  encode_time = time.perf_counter() - start_time
+  start_time = time.perf_counter()
+
+  for _ in range(count):
+    codec.decode(body, properties, model)
+
+  decode_time = time.perf_counter() - start_time
+
+  return count / encode_time, count / decode_time, len(body)
+
+def baseline(model, message, count):
+  body = message.json().encode()
+
+  start_time = time.perf_counter()
+
+  for _ in range(count):
+    message.json()
+
+  encode_time = time.perf_counter() - start_time
+  start_time = time.perf_counter()
+
+  for _ in range(count):
+    model.parse_raw(body)
+
+  decode_time = time.perf_counter() - start_time
+
+  return count / encode_time, count / decode_time, len(body)
+
+def main(count = 20000):
+  messages = [
+    (TaskMessage, TaskMessage(id = ObjectId(), job_id = ObjectId())),
+    (JobMessage, JobMessage(id = ObjectId(), state = 'running')),
+    (ContainerMessage, ContainerMessage(name = 'blender', task_count = 16, upscaling = True))
+  ]
+
+  codecs = [
+    ('json', MessageCodec()),
+    ('json (trusted)', MessageCodec(trusted = True))
+  ]
+
+  if msgpack is not None:
+    codecs.append(('msgpack', MessageCodec(MessagePackCodec())))
+    codecs.append(('msgpack (trusted)', MessageCodec(MessagePackCodec(), trusted = True)))
+
+  print(f'{"model":<18}{"codec":<20}{"encode/s":>12}{"decode/s":>12}{"bytes":>8}')
+
+  for model, message in messages:
+    results = [('baseline', baseline(model, message, count))]
+    results += [(name, measure(codec, model, message, count)) for name, codec in codecs]
+
+    for name, (encode_rate, decode_rate, size) in results:
+      print(f'{model.__name__:<18}{name:<20}{encode_rate:>12.0f}{decode_rate:>12.0f}{size:>8}')
+
+
+if __name__ == '__main__':
+  main()
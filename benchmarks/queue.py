@@ -0,0 +1,131 @@
+import time
+import statistics
+from threading import Thread
+
+from bson.objectid import ObjectId
+
+from renderable_core.models import TaskMessage, JobMessage
+from renderable_core.services import MemoryBroker, MemoryWorkQueue, MemoryEventQueue
+
+
+def percentile(values, fraction):
+  values = sorted(values)
+
+  return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def benchmark_work_queue(count, batch_size, prefetch_count, workers, trusted):
+  broker = MemoryBroker()
+  work_queue = MemoryWorkQueue(broker, trusted = trusted)
+
+  messages = [TaskMessage(id = ObjectId(), job_id = ObjectId()) for _ in range(count)]
+
+  published_at = {}
+  latencies = []
+
+  def callback(channel, method, message):
+    latencies.append(time.perf_counter() - published_at[message.id])
+    channel.basic_ack(delivery_tag = method.delivery_tag)
+
+    if len(latencies) == count:
+      channel.stop_consuming()
+
+  consumer_thread = Thread(
+    target = work_queue.consume,
+    args = (callback, 'benchmark', TaskMessage),
+    kwargs = {'prefetch_count': prefetch_count, 'workers': workers})
+
+  consumer_thread.start()
+
+  start_time = time.perf_counter()
+
+  for index in range(0, count, batch_size):
+    batch = messages[index:index + batch_size]
+    batch_time = time.perf_counter()
+
+    for message in batch:
+      published_at[message.id] = batch_time
+
+    work_queue.publish(batch, 'benchmark')
+
+  publish_time = time.perf_counter() - start_time
+
+  consumer_thread.join()
+
+  total_time = time.perf_counter() - start_time
+
+  return {
+    'publish_rate': count / publish_time,
+    'throughput': count / total_time,
+    'latency_p50': statistics.median(latencies),
+    'latency_p99': percentile(latencies, 0.99)
+  }
+
+def benchmark_event_queue(count, consumers):
+  broker = MemoryBroker()
+  event_queue = MemoryEventQueue(broker)
+
+  received = [0] * consumers
+
+  def create_callback(index):
+    def callback(channel, method, message):
+      received[index] += 1
+
+      if received[index] == count:
+        channel.stop_consuming()
+
+    return callback
+
+  consumer_threads = [
+    Thread(target = event_queue.consume, args = (create_callback(index), 'benchmark', JobMessage))
+    for index in range(consumers)]
+
+  for consumer_thread in consumer_threads:
+    consumer_thread.start()
+
+  while sum(len(names) for names in broker.bindings.values()) < consumers:
+    time.sleep(0.01)
+
+  message = JobMessage(id = ObjectId(), state = 'running')
+
+  start_time = time.perf_counter()
+
+  for _ in range(count):
+    event_queue.publish(message, 'benchmark')
+
+  for consumer_thread in consumer_threads:
+    consumer_thread.join()
+
+  total_time = time.perf_counter() - start_time
+
+  return {
+    'publish_rate': count / total_time,
+    'delivery_rate': count * consumers / total_time
+  }
+
+def main(count = 20000):
+  scenarios = [
+    ('inline, prefetch 1', 100, 1, None, False),
+    ('inline, prefetch 64', 100, 64, None, False),
+    ('inline, prefetch 64, trusted', 100, 64, None, True),
+    ('4 workers, prefetch 64', 100, 64, 4, False)
+  ]
+
+  print(f'{"work queue":<32}{"publish/s":>12}{"consume/s":>12}{"p50 ms":>10}{"p99 ms":>10}')
+
+  for name, batch_size, prefetch_count, workers, trusted in scenarios:
+    result = benchmark_work_queue(count, batch_size, prefetch_count, workers, trusted)
+
+    print(f'{name:<32}{result["publish_rate"]:>12.0f}{result["throughput"]:>12.0f}'
+      f'{result["latency_p50"] * 1000:>10.2f}{result["latency_p99"] * 1000:>10.2f}')
+
+  print()
+  print(f'{"event queue":<32}{"publish/s":>12}{"deliver/s":>12}')
+
+  for consumers in [1, 4]:
+    result = benchmark_event_queue(count // 4, consumers)
+
+    print(f'{f"{consumers} consumers":<32}{result["publish_rate"]:>12.0f}{result["delivery_rate"]:>12.0f}')
+
+
+if __name__ == '__main__':
+  main()
@@ -10,5 +10,7 @@ from .control_frame import ControlFrameType, ControlFrame
 from .resource import ResourceDocument, ResourceMessage
 from .container import ContainerDocument, ContainerMessage, ContainerRequest, ContainerResponse
 from .device import DeviceDocument, DeviceRequest, DeviceResponse
-from .job import JobDocument, JobMessage, JobRequest, JobActionRequest, JobResponse
-from .task import TaskDocument, TaskMessage, TaskRequest, TaskResponse
+from .job import JobDocument, JobMessage, JobRequest, JobActionRequest, SceneUploadRequest, \
+  SceneUploadResponse, SceneChunk, SceneManifestRequest, SceneManifestResponse, JobResponse
+from .task import TaskDocument, TaskMessage, TaskRequest, TaskStateRequest, TaskStateBatchRequest, \
+  TaskStateResponse, TaskStateBatchResponse, TaskResponse
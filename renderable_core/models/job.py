@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 from pydantic import Field, HttpUrl
 
@@ -13,6 +13,7 @@ class JobDocument(Base):
   parallelism: int = Field(..., gt = 0, le = 64)
   container_name: str = Field(...)
   frame_range: FrameRange = Field(...)
+  priority: int = Field(0, ge = 0, le = 9)
   state: State = Field(...)
   scene_url: Optional[HttpUrl] = None
   sequence_url: Optional[HttpUrl] = None
@@ -23,23 +24,51 @@ class JobDocument(Base):
 class JobMessage(Base):
   id: Optional[ObjectID] = None
   state: Optional[State] = None
+  task_counts: Optional[Dict[str, int]] = None
 
 
 class JobRequest(Base):
   parallelism: int = Field(4, gt = 0, le = 64)
   container_name: str = Field(...)
   frame_range: FrameRange = Field(...)
+  priority: int = Field(0, ge = 0, le = 9)
 
 
 class JobActionRequest(Base):
   action: Action = Field(...)
 
 
+class SceneUploadRequest(Base):
+  filename: str = Field(...)
+  size: int = Field(..., ge = 0)
+
+
+class SceneUploadResponse(Base):
+  offset: int = Field(..., ge = 0)
+  size: int = Field(..., ge = 0)
+
+
+class SceneChunk(Base):
+  digest: str = Field(..., regex = '^[0-9a-f]{64}$')
+  offset: int = Field(..., ge = 0)
+  size: int = Field(..., gt = 0)
+
+
+class SceneManifestRequest(Base):
+  filename: str = Field(...)
+  chunks: List[SceneChunk] = Field(...)
+
+
+class SceneManifestResponse(Base):
+  missing_digests: List[str] = Field(...)
+
+
 class JobResponse(Base):
   id: ObjectID = Field(...)
   parallelism: int = Field(..., gt = 0, le = 64)
   container_name: str = Field(...)
   frame_range: FrameRange = Field(...)
+  priority: int = Field(0, ge = 0, le = 9)
   state: State = Field(...)
   scene_url: Optional[HttpUrl] = Field(...)
   sequence_url: Optional[HttpUrl] = Field(...)
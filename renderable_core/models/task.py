@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import Field, HttpUrl
+from pydantic import Field, HttpUrl, conlist
 
 from .. import utils
 from . import ObjectID, State, Base, FrameRange
@@ -27,6 +27,25 @@ class TaskRequest(Base):
   state: State = Field(...)
 
 
+class TaskStateRequest(Base):
+  id: ObjectID = Field(...)
+  state: State = Field(...)
+
+
+class TaskStateBatchRequest(Base):
+  tasks: conlist(TaskStateRequest, min_items = 1)
+
+
+class TaskStateResponse(Base):
+  id: ObjectID = Field(...)
+  state: State = Field(...)
+  updated: bool = Field(...)
+
+
+class TaskStateBatchResponse(Base):
+  tasks: List[TaskStateResponse] = Field(...)
+
+
 class TaskResponse(Base):
   id: ObjectID = Field(...)
   frame_range: FrameRange = Field(...)
@@ -1,10 +1,19 @@
 from .configuration import Configuration
 from .api_client import APIClient
+from .async_api_client import AsyncAPIClient
+from .job_stream import JobStream
+from .task_state_buffer import TaskStateBuffer
 from .cluster import Cluster
 from .autoscaler import Autoscaler
+from .cache import DocumentCache
 from .database import Database
+from .async_database import AsyncDatabase
+from .job_watcher import JobWatcher
 from .storage import Storage
+from .codec import JSONCodec, MessagePackCodec, MessageCodec
 from .queue import WorkQueue, EventQueue
+from .scheduler import Scheduler
+from .memory_queue import MemoryBroker, MemoryWorkQueue, MemoryEventQueue
 from .renderer import Renderer
 from .executor import Executor
 from .machine import Machine
@@ -1,23 +1,38 @@
 import os
 from pathlib import Path
-import json
+import re
+import time
+import shutil
+import hashlib
 import asyncio
+from threading import Lock
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
-import websockets
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from ..models import Action, ControlFrameType, ControlFrame, DeviceRequest, DeviceResponse, \
-  JobRequest, JobActionRequest, JobResponse, TaskRequest, TaskResponse
+from .. import utils
+from ..models import Action, DeviceRequest, DeviceResponse, \
+  JobRequest, JobActionRequest, SceneUploadRequest, SceneUploadResponse, \
+  SceneChunk, SceneManifestRequest, SceneManifestResponse, JobResponse, TaskRequest, TaskStateRequest, TaskStateBatchRequest, \
+  TaskStateBatchResponse, TaskResponse
+from .async_api_client import AsyncAPIClient
 
 
 class APIClient:
-  def __init__(self, hostname, port, version, secure, access_key = None, temporary_directory = None):
+  def __init__(self, hostname, port, version, secure, access_key = None, temporary_directory = None,
+      pool_size = 10, retries = 3, backoff_factor = 0.5):
     self.hostname = hostname
     self.port = port
     self.version = version
     self.secure = secure
     self.access_key = access_key
     self.temporary_directory = temporary_directory
+    self.pool_size = pool_size
+    self.retries = retries
+    self.backoff_factor = backoff_factor
 
     protocol = 'https' if self.secure else 'http'
 
@@ -27,9 +42,92 @@ class APIClient:
       'x-api-key': access_key
     }
 
+    retry = Retry(
+      total = self.retries,
+      backoff_factor = self.backoff_factor,
+      status_forcelist = [502, 503, 504],
+      raise_on_status = False)
+
+    adapter = HTTPAdapter(
+      pool_connections = self.pool_size,
+      pool_maxsize = self.pool_size,
+      max_retries = retry)
+
+    self.session = requests.Session()
+    self.session.mount('http://', adapter)
+    self.session.mount('https://', adapter)
+
+    self.statistics = {}
+    self.statistics_lock = Lock()
+
+    self.uploaded_resources = {}
+    self.uploaded_resources_lock = Lock()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exception_type, exception_value, traceback):
+    self.close()
+
   def _url_from_path(self, path):
     return f'{self.base_url}/{path}'
 
+  def _record_latency(self, endpoint, elapsed_time, failed, size = 0):
+    with self.statistics_lock:
+      if endpoint not in self.statistics:
+        self.statistics[endpoint] = {
+          'count': 0,
+          'errors': 0,
+          'bytes': 0,
+          'total_time': 0.0,
+          'max_time': 0.0
+        }
+
+      statistics = self.statistics[endpoint]
+
+      statistics['count'] += 1
+      statistics['errors'] += int(failed)
+      statistics['bytes'] += 0 if failed else size
+      statistics['total_time'] += elapsed_time
+      statistics['max_time'] = max(statistics['max_time'], elapsed_time)
+
+  def _request(self, method, endpoint, url, size = 0, **kwargs):
+    start_time = time.perf_counter()
+    failed = True
+
+    try:
+      response = self.session.request(method, url, **kwargs)
+      response.raise_for_status()
+
+      failed = False
+    finally:
+      self._record_latency(f'{method} {endpoint}', time.perf_counter() - start_time, failed, size)
+
+    return response
+
+  def _is_retryable(self, error):
+    if isinstance(error, requests.HTTPError):
+      return error.response is not None and error.response.status_code >= 500
+
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+  def get_statistics(self):
+    with self.statistics_lock:
+      statistics = {endpoint: dict(values) for endpoint, values in self.statistics.items()}
+
+    for values in statistics.values():
+      values['mean_time'] = values['total_time'] / values['count']
+      values['throughput'] = values['bytes'] / values['total_time'] if values['total_time'] > 0 else 0.0
+
+    return statistics
+
+  def reset_statistics(self):
+    with self.statistics_lock:
+      self.statistics.clear()
+
+  def close(self):
+    self.session.close()
+
   def _filename_from_resource_url(self, url, prefix):
     id, filename = url.split('/')[-2:]
 
@@ -38,39 +136,236 @@ class APIClient:
   def _path_from_id(self, id, prefix):
     return self.temporary_directory / Path(f'{prefix}/{id}')
 
+  def _object_path_from_etag(self, url, etag):
+    if etag:
+      key = re.sub(r'[^0-9A-Za-z\-]', '', etag)
+    else:
+      key = hashlib.sha256(url.encode()).hexdigest()
+
+    return self._path_from_id('.objects', 'jobs') / key
+
+  def _verify_object(self, path, etag, size, chunk_size):
+    if size >= 0 and path.stat().st_size != size:
+      return False
+
+    checksum = etag.strip('"')
+
+    if re.fullmatch(r'[0-9a-f]{32}', checksum) is None:
+      return True
+
+    digest = hashlib.md5()
+
+    with open(path, 'rb') as file:
+      for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+
+    return digest.hexdigest() == checksum
+
+  def _acquire_object_lock(self, path, stale_period = 60):
+    lock_path = path.with_name(f'{path.name}.lock')
+    partial_path = path.with_name(f'{path.name}.part')
+
+    while True:
+      try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return lock_path
+      except FileExistsError:
+        pass
+
+      try:
+        modified_at = max(
+          candidate.stat().st_mtime for candidate in [lock_path, partial_path] if candidate.exists())
+
+        if time.time() - modified_at > stale_period:
+          lock_path.unlink()
+          continue
+      except (ValueError, FileNotFoundError):
+        continue
+
+      time.sleep(self.backoff_factor)
+
+  def _download_object(self, url, path, etag, size, chunk_size):
+    os.makedirs(path.parent, exist_ok = True)
+
+    lock_path = self._acquire_object_lock(path)
+
+    try:
+      if not path.is_file():
+        self._download_partial_object(url, path, etag, size, chunk_size)
+    finally:
+      lock_path.unlink()
+
+  def _download_partial_object(self, url, path, etag, size, chunk_size):
+    partial_path = path.with_name(f'{path.name}.part')
+
+    for attempt in range(self.retries + 1):
+      offset = partial_path.stat().st_size if partial_path.is_file() else 0
+
+      if size >= 0 and offset > size:
+        partial_path.unlink()
+        offset = 0
+
+      if offset == size:
+        break
+
+      headers = {}
+
+      if offset > 0:
+        headers['Range'] = f'bytes={offset}-'
+
+        if etag:
+          headers['If-Range'] = etag
+
+      try:
+        with self._request('GET', 'scenes', url, headers = headers, stream = True) as response:
+          mode = 'ab' if response.status_code == 206 else 'wb'
+
+          with open(partial_path, mode) as file:
+            for chunk in response.iter_content(chunk_size):
+              file.write(chunk)
+
+        break
+      except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+        if attempt == self.retries:
+          raise
+
+        time.sleep(self.backoff_factor * 2 ** attempt)
+
+    if not self._verify_object(partial_path, etag, size, chunk_size):
+      partial_path.unlink()
+      raise IOError(f'integrity check failed for {url}')
+
+    os.replace(partial_path, path)
+
   def register_device(self, node_type):
     url = self._url_from_path('devices/')
 
     device = DeviceRequest(node_type = node_type)
 
-    response = requests.post(url, json = device.dict())
-    response.raise_for_status()
+    response = self._request('POST', 'devices/', url, json = device.dict())
 
     return DeviceResponse(**response.json())
 
   def get_device(self, id):
     url = self._url_from_path(f'devices/{id}')
 
-    response = requests.get(url)
-    response.raise_for_status()
+    response = self._request('GET', 'devices/{id}', url)
 
     return DeviceResponse(**response.json())
 
   def create_job(self, job):
     url = self._url_from_path('jobs/')
 
-    response = requests.post(url, json = job.dict())
-    response.raise_for_status()
+    response = self._request('POST', 'jobs/', url, json = job.dict())
 
     return JobResponse(**response.json())
 
-  def upload_job_scene(self, id, scene_path):
+  def _get_scene_upload(self, id, scene_path, size):
+    url = self._url_from_path(f'jobs/{id}/scene/upload')
+
+    scene_upload = SceneUploadRequest(filename = scene_path.name, size = size)
+
+    response = self._request('POST', 'jobs/{id}/scene/upload', url, json = scene_upload.dict())
+
+    return SceneUploadResponse(**response.json())
+
+  def _upload_job_scene_chunks(self, id, scene_path, chunk_size, progress_callback):
+    url = self._url_from_path(f'jobs/{id}/scene/upload')
+
+    size = scene_path.stat().st_size
+    offset = self._get_scene_upload(id, scene_path, size).offset
+
+    attempt = 0
+
+    with open(scene_path, 'rb') as file:
+      while offset < size:
+        file.seek(offset)
+        chunk = file.read(chunk_size)
+
+        headers = {
+          'Content-Type': 'application/octet-stream',
+          'Content-Range': f'bytes {offset}-{offset + len(chunk) - 1}/{size}'
+        }
+
+        try:
+          response = self._request('PUT', 'jobs/{id}/scene/upload', url, len(chunk), headers = headers, data = chunk)
+          offset = SceneUploadResponse(**response.json()).offset
+
+          attempt = 0
+        except requests.RequestException as error:
+          if attempt == self.retries or not self._is_retryable(error):
+            raise
+
+          time.sleep(self.backoff_factor * 2 ** attempt)
+          attempt += 1
+
+          offset = self._get_scene_upload(id, scene_path, size).offset
+
+        if progress_callback is not None:
+          progress_callback(offset, size)
+
+    url = self._url_from_path(f'jobs/{id}/scene/upload/complete')
+
+    response = self._request('POST', 'jobs/{id}/scene/upload/complete', url)
+
+    return JobResponse(**response.json())
+
+  def _upload_job_scene_deduplicated(self, id, scene_path, progress_callback):
+    with open(scene_path, 'rb') as file:
+      chunks = [
+        SceneChunk(digest = digest, offset = offset, size = len(chunk))
+        for offset, digest, chunk in utils.content_defined_chunks(file)]
+
+    url = self._url_from_path(f'jobs/{id}/scene/manifest')
+
+    manifest = SceneManifestRequest(filename = scene_path.name, chunks = chunks)
+
+    response = self._request('POST', 'jobs/{id}/scene/manifest', url, json = manifest.dict())
+    missing_digests = set(SceneManifestResponse(**response.json()).missing_digests)
+
+    size = sum(chunk.size for chunk in chunks)
+    offset = 0
+
+    with open(scene_path, 'rb') as file:
+      for chunk in chunks:
+        if chunk.digest in missing_digests:
+          missing_digests.remove(chunk.digest)
+
+          url = self._url_from_path(f'jobs/{id}/scene/chunks/{chunk.digest}')
+
+          file.seek(chunk.offset)
+          data = file.read(chunk.size)
+
+          headers = {'Content-Type': 'application/octet-stream'}
+
+          self._request('PUT', 'jobs/{id}/scene/chunks/{digest}', url, chunk.size, headers = headers, data = data)
+
+        offset += chunk.size
+
+        if progress_callback is not None:
+          progress_callback(offset, size)
+
+    url = self._url_from_path(f'jobs/{id}/scene/manifest/complete')
+
+    response = self._request('POST', 'jobs/{id}/scene/manifest/complete', url)
+
+    return JobResponse(**response.json())
+
+  def upload_job_scene(self, id, scene_path, progress_callback = None, chunk_size = None, deduplicate = False):
+    if deduplicate:
+      return self._upload_job_scene_deduplicated(id, scene_path, progress_callback)
+
+    if chunk_size is not None:
+      return self._upload_job_scene_chunks(id, scene_path, chunk_size, progress_callback)
+
     url = self._url_from_path(f'jobs/{id}/scene')
 
-    scene = { 'scene': (scene_path.name, open(scene_path, 'rb')) }
+    with open(scene_path, 'rb') as file:
+      scene = utils.MultipartEncoder([('scene', (scene_path.name, file))], progress_callback = progress_callback)
+
+      headers = {'Content-Type': scene.content_type}
 
-    response = requests.post(url, files = scene)
-    response.raise_for_status()
+      response = self._request('POST', 'jobs/{id}/scene', url, len(scene), headers = headers, data = scene)
 
     return JobResponse(**response.json())
 
@@ -79,59 +374,34 @@ class APIClient:
 
     job_action = JobActionRequest(action = action)
 
-    response = requests.post(url, json = job_action.dict())
-    response.raise_for_status()
+    response = self._request('POST', 'jobs/{id}', url, json = job_action.dict())
 
     return JobResponse(**response.json())
 
-  def submit_job(self, job, scene_path):
+  def submit_job(self, job, scene_path, progress_callback = None, chunk_size = None, deduplicate = False):
     job_response = self.create_job(job)
-    job_response = self.upload_job_scene(job_response.id, scene_path)
+    job_response = self.upload_job_scene(job_response.id, scene_path, progress_callback, chunk_size, deduplicate)
 
     return self.update_job_state(job_response.id, Action.start)
 
   def get_job(self, id):
     url = self._url_from_path(f'jobs/{id}')
 
-    response = requests.get(url)
-    response.raise_for_status()
+    response = self._request('GET', 'jobs/{id}', url)
 
     return JobResponse(**response.json())
 
   def listen_job(self, id, callback, timeout = 60):
-    url = self._url_from_path(f'jobs/{id}/ws').replace('http', 'ws')
-
-    async def wakeup():
-      while True:
-        await asyncio.sleep(1)
-
-    async def process_message():
-      async with websockets.connect(url, close_timeout = timeout, ping_interval = None) as websocket:
-        while True:
-          data = await websocket.recv()
-          json_data = json.loads(data)
-
-          try:
-            response = ControlFrame(**json_data)
-          except:
-            response = JobResponse(**json_data)
+    async def process_messages():
+      async with AsyncAPIClient(self.hostname, self.port, self.version, self.secure, self.access_key) as client:
+        await client.listen_job(id, callback, timeout)
 
-          if isinstance(response, ControlFrame):
-            pong_frame = ControlFrame(type = ControlFrameType.pong)
-            await websocket.send(pong_frame.json())
-          else:
-            callback(response)
-
-    loop = asyncio.get_event_loop()
-
-    loop.create_task(wakeup())
-    loop.run_until_complete(process_message())
+    asyncio.run(process_messages())
 
   def get_task(self, id):
     url = self._url_from_path(f'tasks/{id}')
 
-    response = requests.get(url, headers = self.authentication_header)
-    response.raise_for_status()
+    response = self._request('GET', 'tasks/{id}', url, headers = self.authentication_header)
 
     return TaskResponse(**response.json())
 
@@ -140,37 +410,112 @@ class APIClient:
 
     task = TaskRequest(state = state)
 
-    response = requests.post(url, headers = self.authentication_header, json = task.dict())
-    response.raise_for_status()
+    response = self._request('POST', 'tasks/{id}', url, headers = self.authentication_header, json = task.dict())
 
     task_response = TaskResponse(**response.json())
 
     return task.state == task_response.state
 
-  def download_task_resource(self, task):
-    url = task.job.scene_url
+  def update_task_states(self, transitions):
+    url = self._url_from_path('tasks/states')
+
+    tasks = [TaskStateRequest(id = id, state = state) for id, state in transitions]
+    batch = TaskStateBatchRequest(tasks = tasks)
 
-    response = requests.get(url)
-    response.raise_for_status()
+    headers = {**self.authentication_header, 'Content-Type': 'application/json'}
 
+    response = self._request('POST', 'tasks/states', url, headers = headers, data = batch.json())
+
+    return TaskStateBatchResponse(**response.json()).tasks
+
+  def download_task_resource(self, task, chunk_size = 1024 * 1024):
+    url = task.job.scene_url
     filename = self._filename_from_resource_url(url, 'jobs')
 
+    if filename.is_file():
+      return filename
+
+    response = self._request('HEAD', 'scenes', url)
+
+    etag = response.headers.get('ETag', '')
+    size = int(response.headers.get('Content-Length', -1))
+
+    object_path = self._object_path_from_etag(url, etag)
+
+    if not object_path.is_file():
+      self._download_object(url, object_path, etag, size, chunk_size)
+
     os.makedirs(filename.parent, exist_ok = True)
 
-    with open(filename, 'wb') as file:
-      file.write(response.content)
+    try:
+      os.link(object_path, filename)
+    except FileExistsError:
+      pass
+    except OSError:
+      copy_path = object_path.with_name(f'{object_path.name}.copy')
+
+      shutil.copyfile(object_path, copy_path)
+      os.replace(copy_path, filename)
 
     return filename
 
-  def upload_task_resources(self, task):
+  def _batch_filenames(self, filenames, batch_size, batch_count):
+    batches = []
+
+    batch = []
+    size = 0
+
+    for filename in filenames:
+      filesize = filename.stat().st_size
+
+      if len(batch) > 0 and (size + filesize > batch_size or len(batch) == batch_count):
+        batches.append((batch, size))
+
+        batch = []
+        size = 0
+
+      batch.append(filename)
+      size += filesize
+
+    if len(batch) > 0:
+      batches.append((batch, size))
+
+    return batches
+
+  def _upload_task_batch(self, task, url, filenames, size):
+    with ExitStack() as stack:
+      images = [
+        ('images', (filename.name, stack.enter_context(open(filename, 'rb'))))
+        for filename in filenames]
+
+      self._request(
+        'POST', 'tasks/{id}/images', url, size,
+        headers = self.authentication_header, files = images)
+
+    with self.uploaded_resources_lock:
+      self.uploaded_resources.setdefault(str(task.id), set()).update(filename.name for filename in filenames)
+
+  def upload_task_resources(self, task, batch_size = 64 * 1024 * 1024, batch_count = 32, workers = 4):
     url = self._url_from_path(f'tasks/{task.id}/images')
 
     path = self._path_from_id(task.id, 'tasks')
-    filenames = path.glob('*')
 
-    images = [('images', (filename.name, open(filename, 'rb'))) for filename in filenames]
+    with self.uploaded_resources_lock:
+      uploaded_filenames = set(self.uploaded_resources.get(str(task.id), set()))
 
-    response = requests.post(url, headers = self.authentication_header, files = images)
-    response.raise_for_status()
+    filenames = sorted(filename for filename in path.glob('*') if filename.name not in uploaded_filenames)
+    batches = self._batch_filenames(filenames, batch_size, batch_count)
 
-    return TaskResponse(**response.json())
+    if len(batches) == 0:
+      return self.get_task(task.id)
+
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+      futures = [executor.submit(self._upload_task_batch, task, url, batch, size) for batch, size in batches]
+
+      for future in futures:
+        future.result()
+
+    with self.uploaded_resources_lock:
+      self.uploaded_resources.pop(str(task.id), None)
+
+    return self.get_task(task.id)
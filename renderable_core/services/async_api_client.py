@@ -0,0 +1,119 @@
+import asyncio
+
+import aiohttp
+
+from ..models import Action, JobActionRequest, JobResponse, TaskResponse
+from .job_stream import JobStream
+
+
+class AsyncAPIClient:
+  def __init__(self, hostname, port, version, secure, access_key = None,
+      pool_size = 100, concurrency = 64, timeout = 60):
+    self.hostname = hostname
+    self.port = port
+    self.version = version
+    self.secure = secure
+    self.access_key = access_key
+    self.pool_size = pool_size
+    self.concurrency = concurrency
+    self.timeout = timeout
+
+    protocol = 'https' if self.secure else 'http'
+
+    self.base_url = f'{protocol}://{self.hostname}:{self.port}/{self.version}'
+
+    self.authentication_header = {
+      'x-api-key': access_key
+    }
+
+    self.session = None
+    self.semaphore = None
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, exception_type, exception_value, traceback):
+    await self.close()
+
+  def _url_from_path(self, path):
+    return f'{self.base_url}/{path}'
+
+  def _get_session(self):
+    if self.session is None or self.session.closed:
+      connector = aiohttp.TCPConnector(limit = self.pool_size)
+      timeout = aiohttp.ClientTimeout(total = None, sock_connect = self.timeout, sock_read = self.timeout)
+
+      self.session = aiohttp.ClientSession(connector = connector, timeout = timeout)
+      self.semaphore = asyncio.Semaphore(self.concurrency)
+
+    return self.session
+
+  async def _request(self, method, path, **kwargs):
+    session = self._get_session()
+
+    async with self.semaphore:
+      async with session.request(method, self._url_from_path(path), **kwargs) as response:
+        response.raise_for_status()
+
+        return await response.json()
+
+  async def close(self):
+    if self.session is not None:
+      await self.session.close()
+
+      self.session = None
+
+  async def create_job(self, job):
+    data = await self._request('POST', 'jobs/', json = job.dict())
+
+    return JobResponse(**data)
+
+  async def upload_job_scene(self, id, scene_path):
+    with open(scene_path, 'rb') as file:
+      scene = aiohttp.FormData()
+      scene.add_field('scene', file, filename = scene_path.name)
+
+      data = await self._request('POST', f'jobs/{id}/scene', data = scene)
+
+    return JobResponse(**data)
+
+  async def update_job_state(self, id, action):
+    job_action = JobActionRequest(action = action)
+
+    data = await self._request('POST', f'jobs/{id}', json = job_action.dict())
+
+    return JobResponse(**data)
+
+  async def submit_job(self, job, scene_path):
+    job_response = await self.create_job(job)
+    job_response = await self.upload_job_scene(job_response.id, scene_path)
+
+    return await self.update_job_state(job_response.id, Action.start)
+
+  async def get_job(self, id):
+    data = await self._request('GET', f'jobs/{id}')
+
+    return JobResponse(**data)
+
+  async def get_jobs(self, ids, return_exceptions = False):
+    coroutines = [self.get_job(id) for id in ids]
+
+    return await asyncio.gather(*coroutines, return_exceptions = return_exceptions)
+
+  async def get_task(self, id):
+    data = await self._request('GET', f'tasks/{id}', headers = self.authentication_header)
+
+    return TaskResponse(**data)
+
+  async def get_tasks(self, ids, return_exceptions = False):
+    coroutines = [self.get_task(id) for id in ids]
+
+    return await asyncio.gather(*coroutines, return_exceptions = return_exceptions)
+
+  def watch_jobs(self, ids, timeout = 60, stop_on_completion = False):
+    return JobStream(self, ids, timeout = timeout, stop_on_completion = stop_on_completion)
+
+  async def listen_job(self, id, callback, timeout = 60):
+    async with self.watch_jobs([id], timeout = timeout) as stream:
+      async for response in stream:
+        callback(response)
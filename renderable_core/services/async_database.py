@@ -0,0 +1,135 @@
+import time
+import asyncio
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncDatabase:
+  def __init__(self, database, workers = 16):
+    self.database = database
+    self.workers = workers
+
+    self.executor = ThreadPoolExecutor(max_workers = self.workers, thread_name_prefix = 'database')
+
+    self.pending = 0
+    self.statistics = {}
+    self.statistics_lock = Lock()
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, exception_type, exception_value, traceback):
+    self.close()
+
+  def _record(self, operation, wait_time, execution_time, error):
+    with self.statistics_lock:
+      values = self.statistics.setdefault(operation, {
+        'count': 0,
+        'errors': 0,
+        'total_wait_time': 0.0,
+        'max_wait_time': 0.0,
+        'total_time': 0.0,
+        'max_time': 0.0
+      })
+
+      values['count'] += 1
+      values['errors'] += int(error)
+      values['total_wait_time'] += wait_time
+      values['max_wait_time'] = max(values['max_wait_time'], wait_time)
+      values['total_time'] += execution_time
+      values['max_time'] = max(values['max_time'], execution_time)
+
+  async def _run(self, operation, *args, **kwargs):
+    function = getattr(self.database, operation)
+    submit_time = time.perf_counter()
+
+    def run():
+      start_time = time.perf_counter()
+      error = True
+
+      try:
+        result = function(*args, **kwargs)
+        error = False
+
+        return result
+      finally:
+        end_time = time.perf_counter()
+        self._record(operation, start_time - submit_time, end_time - start_time, error)
+
+    loop = asyncio.get_running_loop()
+
+    with self.statistics_lock:
+      self.pending += 1
+
+    try:
+      return await loop.run_in_executor(self.executor, run)
+    finally:
+      with self.statistics_lock:
+        self.pending -= 1
+
+  def get_statistics(self):
+    with self.statistics_lock:
+      statistics = {operation: dict(values) for operation, values in self.statistics.items()}
+      pending = self.pending
+
+    for values in statistics.values():
+      values['mean_wait_time'] = values['total_wait_time'] / values['count']
+      values['mean_time'] = values['total_time'] / values['count']
+
+    return {
+      'pending': pending,
+      'workers': self.workers,
+      'operations': statistics
+    }
+
+  def reset_statistics(self):
+    with self.statistics_lock:
+      self.statistics.clear()
+
+  def close(self):
+    self.executor.shutdown(wait = True)
+
+  async def ensure_indexes(self):
+    return await self._run('ensure_indexes')
+
+  async def explain(self, document_query, collection_name):
+    return await self._run('explain', document_query, collection_name)
+
+  async def count(self, document_query, collection_name, estimated = False):
+    return await self._run('count', document_query, collection_name, estimated)
+
+  async def task_counts(self, job_ids = None):
+    return await self._run('task_counts', job_ids)
+
+  async def find(self, document_query, collection_name):
+    return await self._run('find', document_query, collection_name)
+
+  async def find_many(self, document_query, collection_name):
+    return await self._run('find_many', document_query, collection_name)
+
+  async def find_page(self, document_query, collection_name, page_size, projection = None, sort = None, after = None):
+    return await self._run('find_page', document_query, collection_name, page_size, projection, sort, after)
+
+  async def save(self, document, collection_name):
+    return await self._run('save', document, collection_name)
+
+  async def save_many(self, documents, collection_name):
+    return await self._run('save_many', documents, collection_name)
+
+  async def update(self, document_query, document, collection_name):
+    return await self._run('update', document_query, document, collection_name)
+
+  async def update_fields(self, document_query, fields, collection_name):
+    return await self._run('update_fields', document_query, fields, collection_name)
+
+  async def update_many(self, document_query, fields, collection_name):
+    return await self._run('update_many', document_query, fields, collection_name)
+
+  async def bulk_write(self, operations, collection_name, batch_size = 1000):
+    return await self._run('bulk_write', operations, collection_name, batch_size)
+
+  async def bulk_update(self, updates, collection_name, batch_size = 1000):
+    return await self._run('bulk_update', updates, collection_name, batch_size)
+
+  async def claim(self, document_query, fields, collection_name, sort = None):
+    return await self._run('claim', document_query, fields, collection_name, sort)
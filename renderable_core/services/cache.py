@@ -0,0 +1,154 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class DocumentCache:
+  def __init__(self, collections, max_size = 1024, ttl = 60):
+    self.collections = set(collections)
+    self.max_size = max_size
+    self.ttl = ttl
+
+    self.entries = OrderedDict()
+    self.document_keys = {}
+    self.versions = {collection_name: 0 for collection_name in self.collections}
+
+    self.statistics = {
+      'hits': 0,
+      'misses': 0,
+      'evictions': 0,
+      'expirations': 0,
+      'invalidations': 0
+    }
+
+    self.lock = Lock()
+
+  def _key(self, collection_name, document_query):
+    if collection_name not in self.collections:
+      return None
+
+    items = []
+
+    for name, value in sorted(document_query.items()):
+      if isinstance(value, (dict, list)):
+        return None
+
+      try:
+        hash(value)
+      except TypeError:
+        return None
+
+      items.append((name, value))
+
+    return collection_name, tuple(items)
+
+  def _remove(self, key):
+    _, document = self.entries.pop(key)
+    document_key = (key[0], document.id)
+
+    keys = self.document_keys.get(document_key)
+
+    if keys is not None:
+      keys.discard(key)
+
+      if len(keys) == 0:
+        del self.document_keys[document_key]
+
+  def version(self, collection_name):
+    with self.lock:
+      return self.versions.get(collection_name)
+
+  def get(self, collection_name, document_query):
+    key = self._key(collection_name, document_query)
+
+    if key is None:
+      return None
+
+    with self.lock:
+      entry = self.entries.get(key)
+
+      if entry is not None and entry[0] <= time.monotonic():
+        self._remove(key)
+        self.statistics['expirations'] += 1
+
+        entry = None
+
+      if entry is None:
+        self.statistics['misses'] += 1
+        return None
+
+      self.entries.move_to_end(key)
+      self.statistics['hits'] += 1
+
+      document = entry[1]
+
+    return document.copy(deep = True)
+
+  def put(self, collection_name, document_query, document, version = None):
+    key = self._key(collection_name, document_query)
+
+    if key is None or document is None:
+      return
+
+    with self.lock:
+      if version is not None and version != self.versions[collection_name]:
+        return
+
+      if key in self.entries:
+        self._remove(key)
+
+      self.entries[key] = (time.monotonic() + self.ttl, document.copy(deep = True))
+      self.document_keys.setdefault((collection_name, document.id), set()).add(key)
+
+      while len(self.entries) > self.max_size:
+        self._remove(next(iter(self.entries)))
+        self.statistics['evictions'] += 1
+
+  def invalidate(self, collection_name, id):
+    if collection_name not in self.collections:
+      return
+
+    with self.lock:
+      self.versions[collection_name] += 1
+      self.statistics['invalidations'] += 1
+
+      for key in list(self.document_keys.get((collection_name, id), [])):
+        self._remove(key)
+
+  def invalidate_collection(self, collection_name):
+    if collection_name not in self.collections:
+      return
+
+    with self.lock:
+      self.versions[collection_name] += 1
+      self.statistics['invalidations'] += 1
+
+      for key in [key for key in self.entries if key[0] == collection_name]:
+        self._remove(key)
+
+  def event_callback(self, collection_name = 'jobs'):
+    def on_event(channel, method, message):
+      if getattr(message, 'id', None) is None:
+        self.invalidate_collection(collection_name)
+      else:
+        self.invalidate(collection_name, message.id)
+
+    return on_event
+
+  def clear(self):
+    with self.lock:
+      for collection_name in self.versions:
+        self.versions[collection_name] += 1
+
+      self.entries.clear()
+      self.document_keys.clear()
+
+  def get_statistics(self):
+    with self.lock:
+      statistics = dict(self.statistics)
+      statistics['size'] = len(self.entries)
+
+    lookups = statistics['hits'] + statistics['misses']
+    statistics['hit_rate'] = statistics['hits'] / lookups if lookups > 0 else 0
+
+    return statistics
@@ -0,0 +1,159 @@
+import json
+from enum import Enum
+from datetime import datetime
+
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_SINGLETON, SHAPE_LIST
+from bson.objectid import ObjectId
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+try:
+  import msgpack
+except ImportError:
+  msgpack = None
+
+
+SCHEMA_VERSION = 1
+
+
+def _default(value):
+  if isinstance(value, ObjectId):
+    return str(value)
+
+  if isinstance(value, datetime):
+    return value.isoformat().replace('+00:00', 'Z')
+
+  if isinstance(value, Enum):
+    return value.value
+
+  raise TypeError(f'object of type {type(value).__name__} is not serializable')
+
+
+class JSONCodec:
+  content_type = 'application/json'
+
+  def encode(self, data):
+    if orjson is not None:
+      return orjson.dumps(data, default = _default)
+
+    return json.dumps(data, default = _default, separators = (',', ':')).encode()
+
+  def decode(self, body):
+    if orjson is not None:
+      return orjson.loads(body)
+
+    return json.loads(body)
+
+
+class MessagePackCodec:
+  content_type = 'application/msgpack'
+
+  def __init__(self):
+    if msgpack is None:
+      raise ImportError('msgpack is required by MessagePackCodec')
+
+  def encode(self, data):
+    return msgpack.packb(data, default = _default, use_bin_type = True)
+
+  def decode(self, body):
+    return msgpack.unpackb(body, raw = False)
+
+
+class MessageCodec:
+  def __init__(self, codec = None, trusted = False):
+    self.codec = JSONCodec() if codec is None else codec
+    self.trusted = trusted
+
+    self.decoders = {JSONCodec.content_type: JSONCodec()}
+
+    if msgpack is not None:
+      self.decoders[MessagePackCodec.content_type] = MessagePackCodec()
+
+    self.decoders[self.codec.content_type] = self.codec
+
+    self.headers = {'schema-version': SCHEMA_VERSION}
+    self.converters = {}
+
+  def _value_converter(self, field_type):
+    if not isinstance(field_type, type):
+      return None
+
+    if issubclass(field_type, ObjectId):
+      return lambda value: value if isinstance(value, field_type) else field_type(value)
+
+    if issubclass(field_type, Enum):
+      return field_type
+
+    if issubclass(field_type, datetime):
+      return lambda value: datetime.fromisoformat(value.replace('Z', '+00:00')) if isinstance(value, str) else value
+
+    if issubclass(field_type, BaseModel):
+      return lambda value: self.construct(field_type, value) if isinstance(value, dict) else value
+
+    return None
+
+  def _field_converter(self, field):
+    converter = self._value_converter(field.type_)
+
+    if converter is None or field.shape not in [SHAPE_SINGLETON, SHAPE_LIST]:
+      return None
+
+    if field.shape == SHAPE_LIST:
+      return lambda value: None if value is None else [converter(item) for item in value]
+
+    return lambda value: None if value is None else converter(value)
+
+  def _model_converters(self, model):
+    converters = self.converters.get(model)
+
+    if converters is None:
+      converters = [
+        (name, field.alias, self._field_converter(field))
+        for name, field in model.__fields__.items()]
+
+      self.converters[model] = converters
+
+    return converters
+
+  def construct(self, model, data):
+    values = {}
+
+    for name, alias, converter in self._model_converters(model):
+      if alias in data:
+        value = data[alias]
+      elif name in data:
+        value = data[name]
+      else:
+        continue
+
+      values[name] = value if converter is None else converter(value)
+
+    return model.construct(_fields_set = set(values), **values)
+
+  def encode(self, message):
+    body = self.codec.encode(message.dict())
+
+    return body, self.codec.content_type, self.headers
+
+  def decode(self, body, properties, model):
+    content_type = getattr(properties, 'content_type', None) or JSONCodec.content_type
+    headers = getattr(properties, 'headers', None) or {}
+
+    schema_version = headers.get('schema-version', SCHEMA_VERSION)
+
+    if schema_version > SCHEMA_VERSION:
+      raise ValueError(f'unsupported schema version {schema_version}')
+
+    if content_type not in self.decoders:
+      raise ValueError(f'unsupported content type {content_type}')
+
+    data = self.decoders[content_type].decode(body)
+
+    if self.trusted:
+      return self.construct(model, data)
+
+    return model(**data)
@@ -1,19 +1,47 @@
+import time
+
 import pymongo
+from pymongo import IndexModel, UpdateOne, ReturnDocument, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+from pydantic import BaseModel, ValidationError
 
-from ..models import ContainerDocument, DeviceDocument, JobDocument, TaskDocument
+from .. import utils
+from ..models import ObjectID, State, ContainerDocument, DeviceDocument, JobDocument, TaskDocument
+from .job_watcher import JobWatcher
 
 
 class Database:
-  def __init__(self, hostname, port, username, password):
+  def __init__(self, hostname, port, username, password,
+      slow_query_callback = None, slow_query_threshold = 0.1, cache = None,
+      max_pool_size = 100, min_pool_size = 0, connect_timeout = 20, server_selection_timeout = 30,
+      socket_timeout = None, wait_queue_timeout = None):
     self.hostname = hostname
     self.port = port
     self.username = username
     self.password = password
+    self.slow_query_callback = slow_query_callback
+    self.slow_query_threshold = slow_query_threshold
+    self.cache = cache
+    self.max_pool_size = max_pool_size
+    self.min_pool_size = min_pool_size
+    self.connect_timeout = connect_timeout
+    self.server_selection_timeout = server_selection_timeout
+    self.socket_timeout = socket_timeout
+    self.wait_queue_timeout = wait_queue_timeout
+
+    def milliseconds(timeout):
+      return None if timeout is None else int(timeout * 1000)
 
     self.client = pymongo.MongoClient(
       self.hostname, int(self.port),
       username = self.username, password = self.password,
-      tz_aware = True)
+      tz_aware = True,
+      maxPoolSize = self.max_pool_size,
+      minPoolSize = self.min_pool_size,
+      connectTimeoutMS = milliseconds(self.connect_timeout),
+      serverSelectionTimeoutMS = milliseconds(self.server_selection_timeout),
+      socketTimeoutMS = milliseconds(self.socket_timeout),
+      waitQueueTimeoutMS = milliseconds(self.wait_queue_timeout))
 
     self.db = self.client['db']
 
@@ -24,20 +52,280 @@ class Database:
       'tasks': TaskDocument
     }
 
-  def count(self, document_query, collection_name):
+    self.indexes = {
+      'containers': [
+        IndexModel([('name', ASCENDING)])
+      ],
+      'devices': [
+        IndexModel([('node_type', ASCENDING)])
+      ],
+      'jobs': [
+        IndexModel([('state', ASCENDING)]),
+        IndexModel([('container_name', ASCENDING), ('state', ASCENDING)]),
+        IndexModel([('created_at', DESCENDING)]),
+        IndexModel([('updated_at', ASCENDING)])
+      ],
+      'tasks': [
+        IndexModel([('job_id', ASCENDING), ('state', ASCENDING)]),
+        IndexModel([('state', ASCENDING)]),
+        IndexModel([('updated_at', ASCENDING)])
+      ]
+    }
+
+  def _find_stages(self, plan):
+    stages = [plan.get('stage')]
+
+    for key in ['inputStage', 'queryPlan']:
+      if key in plan:
+        stages += self._find_stages(plan[key])
+
+    for input_plan in plan.get('inputStages', []):
+      stages += self._find_stages(input_plan)
+
+    return stages
+
+  def _inspect(self, document_query, collection_name, operation):
+    if self.slow_query_callback is None:
+      return operation()
+
+    start_time = time.perf_counter()
+    result = operation()
+    elapsed_time = time.perf_counter() - start_time
+
+    if elapsed_time >= self.slow_query_threshold:
+      query_plan = self.explain(document_query, collection_name)
+
+      self.slow_query_callback({
+        'collection_name': collection_name,
+        'query': document_query,
+        'elapsed_time': elapsed_time,
+        **query_plan
+      })
+
+    return result
+
+  def _field_alias(self, collection_name, name):
+    field = self.models[collection_name].__fields__.get(name)
+
+    return name if field is None else field.alias
+
+  def _partial_model(self, collection_name, document):
+    model = self.models[collection_name]
+    values = {}
+
+    for name, field in model.__fields__.items():
+      if field.alias in document:
+        value = document[field.alias]
+      elif name in document:
+        value = document[name]
+      else:
+        continue
+
+      value, errors = field.validate(value, values, loc = name, cls = model)
+
+      if errors:
+        raise ValidationError([errors], model)
+
+      values[name] = value
+
+    partial_document = model.__new__(model)
+
+    object.__setattr__(partial_document, '__dict__', values)
+    object.__setattr__(partial_document, '__fields_set__', set(values))
+
+    return partial_document
+
+  def _encode_value(self, value):
+    if isinstance(value, BaseModel):
+      return value.dict(by_alias = True)
+
+    if isinstance(value, list):
+      return [self._encode_value(item) for item in value]
+
+    return value
+
+  def _update_values(self, collection_name, fields):
+    model = self.models[collection_name]
+    values = {}
+
+    for name, value in fields.items():
+      field = model.__fields__[name]
+      value, errors = field.validate(value, values, loc = name, cls = model)
+
+      if errors:
+        raise ValidationError([errors], model)
+
+      values[field.alias] = self._encode_value(value)
+
+    if 'updated_at' in model.__fields__ and 'updated_at' not in fields:
+      values['updated_at'] = utils.utc_now()
+
+    return {'$set': values}
+
+  def _invalidate(self, document_query, collection_name):
+    if self.cache is None:
+      return
+
+    id = document_query.get('_id')
+
+    if id is None or isinstance(id, dict):
+      self.cache.invalidate_collection(collection_name)
+    else:
+      self.cache.invalidate(collection_name, id)
+
+  def _sort_keys(self, collection_name, sort):
+    sort_keys = [(self._field_alias(collection_name, name), direction) for name, direction in sort or []]
+
+    if '_id' not in [name for name, _ in sort_keys]:
+      sort_keys.append(('_id', ASCENDING))
+
+    return sort_keys
+
+  def _keyset_query(self, document_query, sort_keys, after):
+    clauses = []
+
+    for index, (name, direction) in enumerate(sort_keys):
+      clause = {previous_name: after[previous_index] for previous_index, (previous_name, _) in enumerate(sort_keys[:index])}
+      clause[name] = {'$gt' if direction == ASCENDING else '$lt': after[index]}
+
+      clauses.append(clause)
+
+    return {'$and': [document_query, {'$or': clauses}]}
+
+  def keyset_cursor(self, document, collection_name, sort = None):
+    sort_keys = self._sort_keys(collection_name, sort)
+    names = {field.alias: name for name, field in self.models[collection_name].__fields__.items()}
+
+    def sort_value(name):
+      path = name.split('.')
+      value = getattr(document, names.get(path[0], path[0]))
+
+      for key in path[1:]:
+        value = getattr(value, key)
+
+      return value
+
+    return tuple(sort_value(name) for name, _ in sort_keys)
+
+  def iter_many(self, document_query, collection_name, projection = None, sort = None,
+      skip = 0, limit = 0, batch_size = 100, after = None):
     collection = self.db[collection_name]
+    sort_keys = None if sort is None and after is None else self._sort_keys(collection_name, sort)
+
+    if after is not None:
+      document_query = self._keyset_query(document_query, sort_keys, after)
+
+    if projection is not None:
+      projection = {self._field_alias(collection_name, name): True for name in projection}
+
+      for name, _ in sort_keys or []:
+        projection[name.split('.')[0]] = True
+
+    cursor = collection.find(document_query, projection, skip = skip, limit = limit, sort = sort_keys)
+    cursor.batch_size(batch_size)
+
+    try:
+      for document in cursor:
+        if projection is None:
+          yield self.models[collection_name](**document)
+        else:
+          yield self._partial_model(collection_name, document)
+    finally:
+      cursor.close()
+
+  def find_page(self, document_query, collection_name, page_size, projection = None, sort = None, after = None):
+    documents = list(self.iter_many(
+      document_query, collection_name, projection, sort or [],
+      limit = page_size, batch_size = page_size, after = after))
+
+    if len(documents) < page_size:
+      return documents, None
 
-    return collection.find(document_query).count()
+    return documents, self.keyset_cursor(documents[-1], collection_name, sort)
+
+  def watch_jobs(self, debounce = 0.5, poll_interval = 1.0, task_counts = True, use_change_streams = True):
+    return JobWatcher(self, debounce, poll_interval, task_counts, use_change_streams)
+
+  def ensure_indexes(self):
+    for collection_name, indexes in self.indexes.items():
+      self.db[collection_name].create_indexes(indexes)
+
+  def explain(self, document_query, collection_name):
+    command = {
+      'find': collection_name,
+      'filter': document_query
+    }
+
+    result = self.db.command('explain', command, verbosity = 'queryPlanner')
+    stages = self._find_stages(result['queryPlanner']['winningPlan'])
+
+    return {
+      'stages': stages,
+      'index_used': 'COLLSCAN' not in stages
+    }
+
+  def count(self, document_query, collection_name, estimated = False):
+    collection = self.db[collection_name]
+
+    if estimated:
+      if len(document_query) > 0:
+        raise ValueError('estimated count does not support queries')
+
+      return collection.estimated_document_count()
+
+    return self._inspect(document_query, collection_name, lambda: collection.count_documents(document_query))
+
+  def task_counts(self, job_ids = None):
+    pipeline = []
+    keys = {}
+
+    if job_ids is not None:
+      keys = {ObjectID.validate(job_id): job_id for job_id in job_ids}
+      pipeline.append({'$match': {'job_id': {'$in': list(keys)}}})
+
+    pipeline.append({
+      '$group': {
+        '_id': {'job_id': '$job_id', 'state': '$state'},
+        'count': {'$sum': 1}
+      }
+    })
+
+    counts = {job_id: {state.value: 0 for state in State} for job_id in keys.values()}
+
+    for result in self.db['tasks'].aggregate(pipeline):
+      job_id = keys.get(result['_id']['job_id'], result['_id']['job_id'])
+      job_counts = counts.setdefault(job_id, {state.value: 0 for state in State})
+      job_counts[result['_id']['state']] = result['count']
+
+    return counts
 
   def find(self, document_query, collection_name):
+    version = None
+
+    if self.cache is not None:
+      document = self.cache.get(collection_name, document_query)
+
+      if document is not None:
+        return document
+
+      version = self.cache.version(collection_name)
+
     collection = self.db[collection_name]
-    document = collection.find_one(document_query)
+    document = self._inspect(document_query, collection_name, lambda: collection.find_one(document_query))
+
+    if document is None:
+      return None
+
+    document = self.models[collection_name](**document)
 
-    return document if document is None else self.models[collection_name](**document)
+    if self.cache is not None:
+      self.cache.put(collection_name, document_query, document, version)
+
+    return document
 
   def find_many(self, document_query, collection_name):
     collection = self.db[collection_name]
-    documents = collection.find(document_query)
+    documents = self._inspect(document_query, collection_name, lambda: list(collection.find(document_query)))
 
     return [self.models[collection_name](**document) for document in documents]
 
@@ -57,4 +345,81 @@ class Database:
     collection = self.db[collection_name]
     collection.update_one(document_query, {'$set': document.dict(by_alias = True)})
 
+    if self.cache is not None:
+      self.cache.invalidate(collection_name, document.id)
+
     return document
+
+  def update_fields(self, document_query, fields, collection_name):
+    collection = self.db[collection_name]
+    result = collection.update_one(document_query, self._update_values(collection_name, fields))
+
+    self._invalidate(document_query, collection_name)
+
+    return result.modified_count > 0
+
+  def update_many(self, document_query, fields, collection_name):
+    collection = self.db[collection_name]
+    result = collection.update_many(document_query, self._update_values(collection_name, fields))
+
+    self._invalidate(document_query, collection_name)
+
+    return result.modified_count
+
+  def bulk_write(self, operations, collection_name, batch_size = 1000):
+    collection = self.db[collection_name]
+    operations = list(operations)
+
+    result = {
+      'matched': 0,
+      'modified': 0,
+      'inserted': 0,
+      'upserted': 0,
+      'errors': []
+    }
+
+    for start in range(0, len(operations), batch_size):
+      batch = operations[start:start + batch_size]
+
+      try:
+        details = collection.bulk_write(batch, ordered = False).bulk_api_result
+      except BulkWriteError as exception:
+        details = exception.details
+
+        for error in details['writeErrors']:
+          result['errors'].append({**error, 'index': start + error['index']})
+      finally:
+        if self.cache is not None:
+          self.cache.invalidate_collection(collection_name)
+
+      result['matched'] += details['nMatched']
+      result['modified'] += details['nModified']
+      result['inserted'] += details['nInserted']
+      result['upserted'] += details['nUpserted']
+
+    return result
+
+  def bulk_update(self, updates, collection_name, batch_size = 1000):
+    operations = [
+      UpdateOne(document_query, self._update_values(collection_name, fields))
+      for document_query, fields in updates]
+
+    return self.bulk_write(operations, collection_name, batch_size)
+
+  def claim(self, document_query, fields, collection_name, sort = None):
+    collection = self.db[collection_name]
+
+    if sort is not None:
+      sort = [(self._field_alias(collection_name, name), direction) for name, direction in sort]
+
+    document = collection.find_one_and_update(
+      document_query, self._update_values(collection_name, fields),
+      sort = sort, return_document = ReturnDocument.AFTER)
+
+    if document is None:
+      return None
+
+    if self.cache is not None:
+      self.cache.invalidate(collection_name, document['_id'])
+
+    return self.models[collection_name](**document)
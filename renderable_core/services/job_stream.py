@@ -0,0 +1,163 @@
+import json
+import asyncio
+
+import aiohttp
+import websockets
+
+from ..models import State, ControlFrameType, ControlFrame, JobResponse
+
+
+class JobStream:
+  def __init__(self, client, ids = None, timeout = 60, backoff_factor = 0.5, max_backoff = 30,
+      stop_on_completion = False):
+    self.client = client
+    self.timeout = timeout
+    self.backoff_factor = backoff_factor
+    self.max_backoff = max_backoff
+    self.stop_on_completion = stop_on_completion
+
+    self.ids = [] if ids is None else [str(id) for id in ids]
+
+    self.queue = None
+    self.listeners = {}
+    self.last_updates = {}
+
+  def __aiter__(self):
+    self._start()
+
+    return self
+
+  async def __anext__(self):
+    self._start()
+
+    response = await self.queue.get()
+
+    if response is None:
+      raise StopAsyncIteration
+
+    if isinstance(response, Exception):
+      raise response
+
+    return response
+
+  async def __aenter__(self):
+    self._start()
+
+    return self
+
+  async def __aexit__(self, exception_type, exception_value, traceback):
+    await self.close()
+
+  def _start(self):
+    if self.queue is not None:
+      return
+
+    self.queue = asyncio.Queue()
+
+    for id in self.ids:
+      self.add(id)
+
+  def _url_from_id(self, id):
+    return self.client._url_from_path(f'jobs/{id}/ws').replace('http', 'ws')
+
+  def _is_complete(self, response):
+    return response.state in [State.done, State.error]
+
+  def _on_listener_done(self, id, listener):
+    if self.listeners.get(id) is listener:
+      del self.listeners[id]
+
+    if not listener.cancelled() and listener.exception() is not None:
+      self.queue.put_nowait(listener.exception())
+
+    if len(self.listeners) == 0 and self.stop_on_completion:
+      self.queue.put_nowait(None)
+
+  async def _publish(self, id, response):
+    update = (response.updated_at, response.state)
+    last_update = self.last_updates.get(id)
+
+    if last_update is not None and (update[0] < last_update[0] or update == last_update):
+      return
+
+    self.last_updates[id] = update
+
+    await self.queue.put(response)
+
+  async def _listen(self, id):
+    url = self._url_from_id(id)
+    attempt = 0
+
+    while True:
+      try:
+        async with websockets.connect(url, close_timeout = self.timeout, ping_interval = None) as websocket:
+          attempt = 0
+
+          response = await self.client.get_job(id)
+          await self._publish(id, response)
+
+          if self.stop_on_completion and self._is_complete(response):
+            return
+
+          async for data in websocket:
+            json_data = json.loads(data)
+
+            if 'type' in json_data:
+              if json_data['type'] == ControlFrameType.ping:
+                pong_frame = ControlFrame(type = ControlFrameType.pong)
+                await websocket.send(pong_frame.json())
+
+              continue
+
+            response = JobResponse(**json_data)
+            await self._publish(id, response)
+
+            if self.stop_on_completion and self._is_complete(response):
+              return
+      except aiohttp.ClientResponseError as error:
+        if error.status < 500:
+          raise
+      except (websockets.WebSocketException, aiohttp.ClientError, asyncio.TimeoutError, OSError):
+        pass
+
+      delay = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+      attempt += 1
+
+      await asyncio.sleep(delay)
+
+  def add(self, id):
+    id = str(id)
+
+    if id not in self.ids:
+      self.ids.append(id)
+
+    if self.queue is None or id in self.listeners:
+      return
+
+    listener = asyncio.ensure_future(self._listen(id))
+    listener.add_done_callback(lambda future: self._on_listener_done(id, future))
+
+    self.listeners[id] = listener
+
+  def remove(self, id):
+    id = str(id)
+
+    if id in self.ids:
+      self.ids.remove(id)
+
+    listener = self.listeners.pop(id, None)
+
+    if listener is not None:
+      listener.cancel()
+
+  async def close(self):
+    listeners = list(self.listeners.values())
+    self.listeners.clear()
+
+    for listener in listeners:
+      listener.cancel()
+
+    await asyncio.gather(*listeners, return_exceptions = True)
+
+    if self.queue is not None:
+      self.queue.put_nowait(None)
@@ -0,0 +1,230 @@
+import time
+from threading import Thread, Condition, Lock
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from ..models import JobMessage
+
+
+class JobWatcher:
+  def __init__(self, database, debounce = 0.5, poll_interval = 1.0, task_counts = True, use_change_streams = True):
+    self.database = database
+    self.debounce = debounce
+    self.poll_interval = poll_interval
+    self.task_counts = task_counts
+    self.use_change_streams = use_change_streams
+
+    self.subscribers = {}
+    self.subscribers_lock = Lock()
+
+    self.changed_jobs = {}
+    self.resume_token = None
+    self.last_updated_at = None
+    self.mode = None
+    self.closed = False
+
+    self.statistics = {
+      'changes': 0,
+      'updates': 0,
+      'errors': 0
+    }
+
+    self.condition = Condition()
+
+    self.watch_thread = Thread(target = self._watch, daemon = True)
+    self.dispatch_thread = Thread(target = self._dispatch_periodically, daemon = True)
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, exception_type, exception_value, traceback):
+    self.close()
+
+  def start(self):
+    self.last_updated_at = self._latest_updated_at()
+
+    self.watch_thread.start()
+    self.dispatch_thread.start()
+
+  def subscribe(self, callback, job_id = None):
+    with self.subscribers_lock:
+      self.subscribers.setdefault(job_id, []).append(callback)
+
+  def unsubscribe(self, callback, job_id = None):
+    with self.subscribers_lock:
+      callbacks = self.subscribers.get(job_id, [])
+
+      if callback in callbacks:
+        callbacks.remove(callback)
+
+      if len(callbacks) == 0:
+        self.subscribers.pop(job_id, None)
+
+  def _mark_changed(self, job_ids):
+    now = time.monotonic()
+
+    with self.condition:
+      for job_id in job_ids:
+        self.changed_jobs.setdefault(job_id, now)
+        self.statistics['changes'] += 1
+
+      self.condition.notify_all()
+
+  def _latest_updated_at(self):
+    latest_updated_at = None
+
+    for collection_name in ['jobs', 'tasks']:
+      document = self.database.db[collection_name].find_one(
+        {}, {'updated_at': True}, sort = [('updated_at', -1)])
+
+      if document is not None and (latest_updated_at is None or document['updated_at'] > latest_updated_at):
+        latest_updated_at = document['updated_at']
+
+    return latest_updated_at
+
+  def _job_id_from_change(self, change):
+    if change['ns']['coll'] == 'jobs':
+      return change['documentKey']['_id']
+
+    document = change.get('fullDocument')
+
+    return None if document is None else document['job_id']
+
+  def _watch_changes(self):
+    pipeline = [{
+      '$match': {
+        'ns.coll': {'$in': ['jobs', 'tasks']},
+        'operationType': {'$in': ['insert', 'update', 'replace']}
+      }
+    }]
+
+    with self.database.db.watch(
+        pipeline, full_document = 'updateLookup', resume_after = self.resume_token,
+        max_await_time_ms = int(self.poll_interval * 1000)) as stream:
+      self.mode = 'change_stream'
+
+      while not self.closed:
+        change = stream.try_next()
+        self.resume_token = stream.resume_token
+
+        if change is None:
+          continue
+
+        job_id = self._job_id_from_change(change)
+
+        if job_id is not None:
+          self._mark_changed([job_id])
+
+  def _poll_changes(self):
+    self.mode = 'polling'
+
+    while not self.closed:
+      document_query = {} if self.last_updated_at is None else {'updated_at': {'$gt': self.last_updated_at}}
+      job_ids = set()
+
+      for collection_name, key in [('jobs', '_id'), ('tasks', 'job_id')]:
+        for document in self.database.db[collection_name].find(document_query, {key: True, 'updated_at': True}):
+          job_ids.add(document[key])
+
+          if self.last_updated_at is None or document['updated_at'] > self.last_updated_at:
+            self.last_updated_at = document['updated_at']
+
+      if len(job_ids) > 0:
+        self._mark_changed(job_ids)
+
+      with self.condition:
+        self.condition.wait_for(lambda: self.closed, timeout = self.poll_interval)
+
+  def _watch(self):
+    use_change_streams = self.use_change_streams
+
+    while not self.closed:
+      try:
+        if use_change_streams:
+          self._watch_changes()
+        else:
+          self._poll_changes()
+      except OperationFailure:
+        if use_change_streams and self.mode is None:
+          use_change_streams = False
+        else:
+          self.resume_token = None
+          time.sleep(self.poll_interval)
+      except PyMongoError:
+        time.sleep(self.poll_interval)
+
+  def _take_due_jobs(self):
+    now = time.monotonic()
+    job_ids = [job_id for job_id, changed_at in self.changed_jobs.items() if changed_at + self.debounce <= now]
+
+    for job_id in job_ids:
+      del self.changed_jobs[job_id]
+
+    return job_ids
+
+  def _build_messages(self, job_ids):
+    jobs = self.database.iter_many({'_id': {'$in': job_ids}}, 'jobs', projection = ['id', 'state'])
+    task_counts = self.database.task_counts(job_ids) if self.task_counts else {}
+
+    return [
+      JobMessage(id = job.id, state = job.state, task_counts = task_counts.get(job.id))
+      for job in jobs]
+
+  def _publish(self, message):
+    with self.subscribers_lock:
+      callbacks = self.subscribers.get(message.id, []) + self.subscribers.get(None, [])
+
+    for callback in callbacks:
+      try:
+        callback(message)
+      except Exception:
+        with self.condition:
+          self.statistics['errors'] += 1
+
+  def _dispatch_periodically(self):
+    while True:
+      with self.condition:
+        while not self.closed and len(self.changed_jobs) == 0:
+          self.condition.wait()
+
+        if self.closed:
+          return
+
+        job_ids = self._take_due_jobs()
+
+        if len(job_ids) == 0:
+          remaining_time = min(self.changed_jobs.values()) + self.debounce - time.monotonic()
+          self.condition.wait(max(remaining_time, 0))
+          continue
+
+      try:
+        messages = self._build_messages(job_ids)
+      except PyMongoError:
+        self._mark_changed(job_ids)
+        time.sleep(self.poll_interval)
+        continue
+
+      for message in messages:
+        self._publish(message)
+
+      with self.condition:
+        self.statistics['updates'] += len(messages)
+
+  def get_statistics(self):
+    with self.condition:
+      statistics = dict(self.statistics)
+      statistics['pending'] = len(self.changed_jobs)
+
+    statistics['mode'] = self.mode
+
+    return statistics
+
+  def close(self):
+    with self.condition:
+      self.closed = True
+      self.condition.notify_all()
+
+    for thread in [self.watch_thread, self.dispatch_thread]:
+      if thread.is_alive():
+        thread.join()
@@ -0,0 +1,304 @@
+import uuid
+from types import SimpleNamespace
+from collections import deque
+from threading import Condition, Lock
+
+from .queue import WorkQueue, EventQueue
+
+
+class MemoryBroker:
+  def __init__(self):
+    self.queues = {}
+    self.bindings = {}
+
+    self.condition = Condition()
+
+  def declare_queue(self, name, arguments = None):
+    with self.condition:
+      if name not in self.queues:
+        max_priority = (arguments or {}).get('x-max-priority', 0)
+        self.queues[name] = [deque() for _ in range(max_priority + 1)]
+
+  def delete_queue(self, name):
+    with self.condition:
+      self.queues.pop(name, None)
+
+      for queue_names in self.bindings.values():
+        queue_names.discard(name)
+
+  def bind_queue(self, exchange, name, routing_key):
+    with self.condition:
+      self.bindings.setdefault((exchange, routing_key), set()).add(name)
+
+  def _enqueue(self, name, message, front = False):
+    priorities = self.queues.get(name)
+
+    if priorities is None:
+      return
+
+    priority = min(message['properties'].priority or 0, len(priorities) - 1) \
+      if message['properties'] is not None else 0
+
+    if front:
+      priorities[priority].appendleft(message)
+    else:
+      priorities[priority].append(message)
+
+  def publish(self, exchange, routing_key, body, properties):
+    message = {
+      'exchange': exchange,
+      'routing_key': routing_key,
+      'body': body,
+      'properties': properties,
+      'redelivered': False
+    }
+
+    with self.condition:
+      if exchange == '':
+        queue_names = [routing_key]
+      else:
+        queue_names = self.bindings.get((exchange, routing_key), set())
+
+      for name in queue_names:
+        self._enqueue(name, dict(message))
+
+      self.condition.notify_all()
+
+  def requeue(self, name, message):
+    with self.condition:
+      message['redelivered'] = True
+      self._enqueue(name, message, front = True)
+
+      self.condition.notify_all()
+
+  def take(self, name):
+    priorities = self.queues.get(name)
+
+    if priorities is None:
+      return None
+
+    for messages in reversed(priorities):
+      if len(messages) > 0:
+        return messages.popleft()
+
+    return None
+
+  def message_count(self, name):
+    with self.condition:
+      return sum(len(messages) for messages in self.queues.get(name, []))
+
+
+class MemoryConnection:
+  def __init__(self, broker):
+    self.broker = broker
+    self.callbacks = []
+    self.channels = []
+    self.is_open = True
+
+  def add_callback_threadsafe(self, callback):
+    with self.broker.condition:
+      self.callbacks.append(callback)
+      self.broker.condition.notify_all()
+
+  def channel(self):
+    channel = MemoryChannel(self)
+    self.channels.append(channel)
+
+    return channel
+
+  def process_data_events(self, time_limit = 0):
+    with self.broker.condition:
+      callbacks = self.callbacks
+      self.callbacks = []
+
+    for callback in callbacks:
+      callback()
+
+  def close(self):
+    for channel in self.channels:
+      channel.close()
+
+    self.is_open = False
+
+
+class MemoryChannel:
+  def __init__(self, connection):
+    self.connection = connection
+    self.broker = connection.broker
+
+    self.prefetch_count = 0
+    self.consumers = []
+    self.unacked = {}
+    self.delivery_tag = 0
+    self.consuming = False
+    self.exclusive_queues = []
+    self.is_open = True
+
+  def queue_declare(self, queue, durable = False, exclusive = False, arguments = None):
+    name = queue if queue != '' else f'amq.gen-{uuid.uuid4().hex}'
+
+    self.broker.declare_queue(name, arguments)
+
+    if exclusive:
+      self.exclusive_queues.append(name)
+
+    return SimpleNamespace(method = SimpleNamespace(queue = name))
+
+  def exchange_declare(self, exchange, exchange_type = 'direct'):
+    pass
+
+  def queue_bind(self, exchange, queue, routing_key):
+    self.broker.bind_queue(exchange, queue, routing_key)
+
+  def basic_qos(self, prefetch_count = 0):
+    self.prefetch_count = prefetch_count
+
+  def basic_publish(self, exchange, routing_key, body, properties = None):
+    self.broker.publish(exchange, routing_key, body, properties)
+
+  def basic_consume(self, queue, on_message_callback, auto_ack = False):
+    self.consumers.append((queue, on_message_callback, auto_ack))
+
+  def _settle(self, delivery_tag, multiple, requeue):
+    if multiple:
+      delivery_tags = [tag for tag in self.unacked if tag <= delivery_tag]
+    else:
+      delivery_tags = [delivery_tag]
+
+    for tag in delivery_tags:
+      delivery = self.unacked.pop(tag, None)
+
+      if delivery is not None and requeue:
+        self.broker.requeue(*delivery)
+
+    with self.broker.condition:
+      self.broker.condition.notify_all()
+
+  def basic_ack(self, delivery_tag = 0, multiple = False):
+    self._settle(delivery_tag, multiple, False)
+
+  def basic_nack(self, delivery_tag = 0, multiple = False, requeue = True):
+    self._settle(delivery_tag, multiple, requeue)
+
+  def basic_reject(self, delivery_tag = 0, requeue = True):
+    self._settle(delivery_tag, False, requeue)
+
+  def _can_deliver(self):
+    return self.prefetch_count == 0 or len(self.unacked) < self.prefetch_count
+
+  def _take_deliveries(self):
+    deliveries = []
+
+    for queue_name, callback, auto_ack in self.consumers:
+      while auto_ack or self._can_deliver():
+        message = self.broker.take(queue_name)
+
+        if message is None:
+          break
+
+        self.delivery_tag += 1
+
+        if not auto_ack:
+          self.unacked[self.delivery_tag] = (queue_name, message)
+
+        deliveries.append((callback, self.delivery_tag, message))
+
+    return deliveries
+
+  def _has_work(self):
+    if not self.consuming or len(self.connection.callbacks) > 0:
+      return True
+
+    for queue_name, _, auto_ack in self.consumers:
+      if not auto_ack and not self._can_deliver():
+        continue
+
+      if any(len(messages) > 0 for messages in self.broker.queues.get(queue_name, [])):
+        return True
+
+    return False
+
+  def start_consuming(self):
+    self.consuming = True
+
+    while self.consuming:
+      self.connection.process_data_events()
+
+      with self.broker.condition:
+        deliveries = self._take_deliveries()
+
+        if len(deliveries) == 0:
+          self.broker.condition.wait_for(self._has_work, timeout = 1)
+
+      for callback, delivery_tag, message in deliveries:
+        method = SimpleNamespace(
+          delivery_tag = delivery_tag,
+          exchange = message['exchange'],
+          routing_key = message['routing_key'],
+          redelivered = message['redelivered'])
+
+        callback(self, method, message['properties'], message['body'])
+
+  def stop_consuming(self):
+    with self.broker.condition:
+      self.consuming = False
+      self.broker.condition.notify_all()
+
+  def close(self):
+    self.stop_consuming()
+
+    for delivery_tag in list(self.unacked):
+      self.basic_nack(delivery_tag)
+
+    for name in self.exclusive_queues:
+      self.broker.delete_queue(name)
+
+    self.is_open = False
+
+
+class MemoryChannelPool:
+  def __init__(self, broker):
+    self.connection = MemoryConnection(broker)
+    self.channel = self.connection.channel()
+
+    self.lock = Lock()
+
+  def declare(self, channel, key, declaration):
+    declaration(channel)
+
+  def run(self, operation, retries = 1, can_retry = None):
+    with self.lock:
+      return operation(self.channel)
+
+  def close(self):
+    self.connection.close()
+
+
+class MemoryQueueMixin:
+  def __init__(self, broker, codec = None, trusted = False, max_priority = None):
+    super().__init__('localhost', 5672, 'guest', 'guest', codec = codec, trusted = trusted, max_priority = max_priority)
+
+    self.broker = broker
+
+  def _connect(self):
+    return MemoryConnection(self.broker)
+
+  def _get_pool(self):
+    with self.pool_lock:
+      if self.pool is None:
+        self.pool = MemoryChannelPool(self.broker)
+
+    return self.pool
+
+
+class MemoryWorkQueue(MemoryQueueMixin, WorkQueue):
+  def publish_confirmed(self, messages, routing_key, window = 256, retries = 3, priority = None, backoff_factor = 0.5):
+    messages = list(messages)
+
+    self.publish(messages, routing_key, priority)
+
+    return messages
+
+
+class MemoryEventQueue(MemoryQueueMixin, EventQueue):
+  pass
@@ -1,86 +1,556 @@
-import json
+import time
+from queue import LifoQueue, Empty
+from collections import deque
+from threading import Thread, Lock, Semaphore
+from functools import partial
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 import pika
 
+from .codec import MessageCodec
+
+
+class ChannelPool:
+  def __init__(self, parameters, size = 4, keep_alive_period = 30):
+    self.parameters = parameters
+    self.size = size
+    self.keep_alive_period = keep_alive_period
+
+    self.channels = LifoQueue()
+    self.connection_count = 0
+    self.declarations = set()
+    self.lock = Lock()
+    self.closed = False
+
+    keep_alive_thread = Thread(target = self._keep_alive, daemon = True)
+    keep_alive_thread.start()
+
+  def _open(self):
+    connection = pika.BlockingConnection(self.parameters)
+
+    try:
+      channel = connection.channel()
+    except:
+      connection.close()
+      raise
+
+    return connection, channel
+
+  def _is_alive(self, connection, channel):
+    if not connection.is_open or not channel.is_open:
+      return False
+
+    try:
+      connection.process_data_events(0)
+    except pika.exceptions.AMQPError:
+      return False
+
+    return True
+
+  def _discard(self, connection):
+    with self.lock:
+      self.connection_count -= 1
+      self.declarations.clear()
+
+    try:
+      if connection.is_open:
+        connection.close()
+    except pika.exceptions.AMQPError:
+      pass
+
+  def _acquire(self):
+    while True:
+      try:
+        connection, channel = self.channels.get_nowait()
+      except Empty:
+        with self.lock:
+          can_open = self.connection_count < self.size
+
+          if can_open:
+            self.connection_count += 1
+
+        if can_open:
+          try:
+            return self._open()
+          except:
+            with self.lock:
+              self.connection_count -= 1
+
+            raise
+
+        try:
+          connection, channel = self.channels.get(timeout = 1)
+        except Empty:
+          continue
+
+      if self._is_alive(connection, channel):
+        return connection, channel
+
+      self._discard(connection)
+
+  def _release(self, connection, channel):
+    if self.closed:
+      self._discard(connection)
+    else:
+      self.channels.put((connection, channel))
+
+  def _keep_alive(self):
+    while not self.closed:
+      time.sleep(self.keep_alive_period)
+
+      idle_channels = []
+
+      while True:
+        try:
+          idle_channels.append(self.channels.get_nowait())
+        except Empty:
+          break
+
+      for connection, channel in idle_channels:
+        if self._is_alive(connection, channel):
+          self._release(connection, channel)
+        else:
+          self._discard(connection)
+
+  @contextmanager
+  def channel(self):
+    connection, channel = self._acquire()
+
+    try:
+      yield channel
+    except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError):
+      self._discard(connection)
+      raise
+    except:
+      self._release(connection, channel)
+      raise
+
+    self._release(connection, channel)
+
+  def declare(self, channel, key, declaration):
+    if key in self.declarations:
+      return
+
+    declaration(channel)
+
+    with self.lock:
+      self.declarations.add(key)
+
+  def run(self, operation, retries = 1, can_retry = None):
+    for attempt in range(retries + 1):
+      try:
+        with self.channel() as channel:
+          return operation(channel)
+      except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError):
+        if attempt == retries or (can_retry is not None and not can_retry()):
+          raise
+
+  def close(self):
+    self.closed = True
+
+    while True:
+      try:
+        connection, _ = self.channels.get_nowait()
+      except Empty:
+        break
+
+      self._discard(connection)
+
+
+class ThreadSafeChannel:
+  def __init__(self, connection, channel):
+    self.connection = connection
+    self.channel = channel
+
+  def _call(self, function, *args, **kwargs):
+    self.connection.add_callback_threadsafe(partial(function, *args, **kwargs))
+
+  def basic_ack(self, delivery_tag = 0, multiple = False):
+    self._call(self.channel.basic_ack, delivery_tag = delivery_tag, multiple = multiple)
+
+  def basic_nack(self, delivery_tag = 0, multiple = False, requeue = True):
+    self._call(self.channel.basic_nack, delivery_tag = delivery_tag, multiple = multiple, requeue = requeue)
+
+  def basic_reject(self, delivery_tag = 0, requeue = True):
+    self._call(self.channel.basic_reject, delivery_tag = delivery_tag, requeue = requeue)
+
+  def stop_consuming(self):
+    self._call(self.channel.stop_consuming)
+
+
+class ConfirmedPublisher:
+  def __init__(self, parameters, routing_key, bodies, properties, window = 256, retries = 3, arguments = None,
+      backoff_factor = 0.5):
+    self.parameters = parameters
+    self.routing_key = routing_key
+    self.bodies = bodies
+    self.properties = properties
+    self.arguments = arguments
+    self.window = window
+    self.retries = retries
+    self.backoff_factor = backoff_factor
+
+    self.pending = deque(range(len(self.bodies)))
+    self.outstanding = {}
+    self.attempts = [0] * len(self.bodies)
+    self.confirmed = set()
+
+    self.connection = None
+    self.channel = None
+    self.delivery_tag = 0
+    self.declared = False
+    self.error = None
+
+  def _on_connection_open(self, connection):
+    connection.channel(on_open_callback = self._on_channel_open)
+
+  def _on_connection_open_error(self, connection, error):
+    self.error = error
+    connection.ioloop.stop()
+
+  def _on_connection_closed(self, connection, reason):
+    if not isinstance(reason, pika.exceptions.ConnectionClosedByClient):
+      self.error = reason
+
+    connection.ioloop.stop()
+
+  def _on_channel_open(self, channel):
+    self.channel = channel
+    self.delivery_tag = 0
+
+    self.channel.add_on_close_callback(self._on_channel_closed)
+    self.channel.confirm_delivery(self._on_delivery_confirmation, callback = self._on_confirm_select)
+
+  def _on_channel_closed(self, channel, reason):
+    if not isinstance(reason, pika.exceptions.ChannelClosedByClient):
+      self.error = reason
+
+    if self.connection.is_open:
+      self.connection.close()
+
+  def _on_confirm_select(self, frame):
+    self.channel.queue_declare(
+      self.routing_key, durable = True, arguments = self.arguments, callback = self._on_queue_declared)
+
+  def _on_queue_declared(self, frame):
+    self.declared = True
+    self._publish_pending()
+
+  def _publish_pending(self):
+    while len(self.pending) > 0 and len(self.outstanding) < self.window:
+      index = self.pending.popleft()
+
+      self.channel.basic_publish(
+        exchange = '',
+        routing_key = self.routing_key,
+        body = self.bodies[index],
+        properties = self.properties)
+
+      self.delivery_tag += 1
+      self.outstanding[self.delivery_tag] = index
+
+    if len(self.pending) == 0 and len(self.outstanding) == 0 and self.connection.is_open:
+      self.connection.close()
+
+  def _retry(self, index):
+    self.attempts[index] += 1
+
+    if self.attempts[index] <= self.retries:
+      self.pending.append(index)
+
+  def _on_delivery_confirmation(self, frame):
+    method = frame.method
+    acknowledged = isinstance(method, pika.spec.Basic.Ack)
+
+    if method.multiple:
+      delivery_tags = [tag for tag in self.outstanding if tag <= method.delivery_tag]
+    else:
+      delivery_tags = [method.delivery_tag]
+
+    for delivery_tag in delivery_tags:
+      index = self.outstanding.pop(delivery_tag, None)
+
+      if index is None:
+        continue
+
+      if acknowledged:
+        self.confirmed.add(index)
+      else:
+        self._retry(index)
+
+    self._publish_pending()
+
+  def run(self):
+    for attempt in range(self.retries + 1):
+      if len(self.pending) == 0:
+        break
+
+      self.connection = pika.SelectConnection(
+        self.parameters,
+        on_open_callback = self._on_connection_open,
+        on_open_error_callback = self._on_connection_open_error,
+        on_close_callback = self._on_connection_closed)
+
+      self.error = None
+      self.connection.ioloop.start()
+
+      for index in self.outstanding.values():
+        self._retry(index)
+
+      self.outstanding.clear()
+
+      if isinstance(self.error, pika.exceptions.ChannelClosedByBroker) and self.error.reply_code == 406:
+        break
+
+      if len(self.pending) > 0 and attempt < self.retries:
+        time.sleep(self.backoff_factor * 2 ** attempt)
+
+    if not self.declared and self.error is not None:
+      raise self.error
+
+    return self.confirmed
+
 
 class Queue:
-  def __init__(self, hostname, port, username, password, heartbeat = 120):
+  def __init__(self, hostname, port, username, password, heartbeat = 120, pool_size = 4,
+      codec = None, trusted = False, max_priority = None):
     self.hostname = hostname
     self.port = port
     self.username = username
     self.password = password
     self.heartbeat = heartbeat
+    self.pool_size = pool_size
+    self.max_priority = max_priority
+
+    self.codec = MessageCodec(codec, trusted)
 
     credentials = pika.PlainCredentials(self.username, self.password)
 
     self.parameters = pika.ConnectionParameters(
       self.hostname, self.port, '/', credentials, heartbeat = self.heartbeat)
 
+    self.pool = None
+    self.pool_lock = Lock()
+
+    self.statistics = {}
+    self.statistics_lock = Lock()
+
+  def _connect(self):
+    return pika.BlockingConnection(self.parameters)
+
+  def _get_pool(self):
+    with self.pool_lock:
+      if self.pool is None:
+        self.pool = ChannelPool(self.parameters, self.pool_size, max(self.heartbeat / 4, 1))
+
+    return self.pool
+
+  def _record_processing_time(self, routing_key, elapsed_time):
+    with self.statistics_lock:
+      if routing_key not in self.statistics:
+        self.statistics[routing_key] = {
+          'count': 0,
+          'total_time': 0.0,
+          'max_time': 0.0
+        }
+
+      statistics = self.statistics[routing_key]
+
+      statistics['count'] += 1
+      statistics['total_time'] += elapsed_time
+      statistics['max_time'] = max(statistics['max_time'], elapsed_time)
+
+  def _queue_arguments(self):
+    if self.max_priority is None:
+      return None
+
+    return {'x-max-priority': self.max_priority}
+
+  def _encode_messages(self, messages, delivery_mode = None, priority = None):
+    bodies = []
+
+    for message in messages:
+      body, content_type, headers = self.codec.encode(message)
+      bodies.append(body)
+
+    if len(bodies) == 0:
+      return bodies, None
+
+    if priority is not None and self.max_priority is not None:
+      priority = min(max(int(priority), 0), self.max_priority)
+    else:
+      priority = None
+
+    properties = pika.BasicProperties(
+      content_type = content_type,
+      headers = headers,
+      delivery_mode = delivery_mode,
+      priority = priority)
+
+    return bodies, properties
+
+  def _process_message(self, callback, channel, method, message):
+    start_time = time.perf_counter()
+
+    try:
+      callback(channel, method, message)
+    finally:
+      self._record_processing_time(method.routing_key, time.perf_counter() - start_time)
+
   def _wrap_callback(self, callback, model):
     def on_message_callback(channel, method, properties, body):
-      message = model(**json.loads(body.decode()))
-      callback(channel, method, message)
+      message = self.codec.decode(body, properties, model)
+      self._process_message(callback, channel, method, message)
 
     return on_message_callback
 
+  def _wrap_pooled_callback(self, callback, model, connection, executor, workers, errors):
+    pending_messages = Semaphore(workers * 2)
+
+    def process_message(channel, method, message):
+      try:
+        self._process_message(callback, channel, method, message)
+      except Exception as error:
+        errors.append(error)
+        channel.stop_consuming()
+      finally:
+        pending_messages.release()
+
+    def on_message_callback(channel, method, properties, body):
+      message = self.codec.decode(body, properties, model)
+
+      pending_messages.acquire()
+      executor.submit(process_message, ThreadSafeChannel(connection, channel), method, message)
+
+    return on_message_callback
+
+  def _start_consuming(self, connection, channel, queue_name, callback, model, workers, auto_ack = False):
+    try:
+      if workers is None:
+        channel.basic_consume(
+          queue = queue_name,
+          on_message_callback = self._wrap_callback(callback, model),
+          auto_ack = auto_ack)
+
+        channel.start_consuming()
+        return
+
+      errors = []
+
+      with ThreadPoolExecutor(max_workers = workers) as executor:
+        channel.basic_consume(
+          queue = queue_name,
+          on_message_callback = self._wrap_pooled_callback(callback, model, connection, executor, workers, errors),
+          auto_ack = auto_ack)
+
+        channel.start_consuming()
+
+      if len(errors) > 0:
+        raise errors[0]
+    finally:
+      if connection.is_open:
+        connection.close()
+
+  def get_statistics(self):
+    with self.statistics_lock:
+      statistics = {routing_key: dict(values) for routing_key, values in self.statistics.items()}
+
+    for values in statistics.values():
+      values['mean_time'] = values['total_time'] / values['count']
+
+    return statistics
+
   def publish(self, message, routing_key):
     raise NotImplementedError
 
-  def consume(self, callback, routing_key, model):
+  def consume(self, callback, routing_key, model, workers = None):
     raise NotImplementedError
 
+  def close(self):
+    with self.pool_lock:
+      if self.pool is not None:
+        self.pool.close()
+        self.pool = None
+
 
 class WorkQueue(Queue):
-  def publish(self, messages, routing_key):
+  def publish(self, messages, routing_key, priority = None):
     routing_key = str(routing_key)
+    bodies, properties = self._encode_messages(messages, delivery_mode = 2, priority = priority)
 
-    connection = pika.BlockingConnection(self.parameters)
-    channel = connection.channel()
+    pool = self._get_pool()
 
-    channel.queue_declare(queue = routing_key, durable = True)
+    def declare_queue(channel):
+      channel.queue_declare(queue = routing_key, durable = True, arguments = self._queue_arguments())
 
-    for message in messages:
-      channel.basic_publish(
-        exchange = '',
-        routing_key = routing_key,
-        body = message.json(),
-        properties = pika.BasicProperties(delivery_mode = 2))
+    published_count = 0
+
+    def publish_messages(channel):
+      nonlocal published_count
+
+      pool.declare(channel, ('queue', routing_key), declare_queue)
 
-    connection.close()
+      for body in bodies:
+        channel.basic_publish(
+          exchange = '',
+          routing_key = routing_key,
+          body = body,
+          properties = properties)
 
-  def consume(self, callback, routing_key, model):
+        published_count += 1
+
+    pool.run(publish_messages, can_retry = lambda: published_count == 0)
+
+  def publish_confirmed(self, messages, routing_key, window = 256, retries = 3, priority = None, backoff_factor = 0.5):
     routing_key = str(routing_key)
 
-    connection = pika.BlockingConnection(self.parameters)
+    messages = list(messages)
+    bodies, properties = self._encode_messages(messages, delivery_mode = 2, priority = priority)
+
+    publisher = ConfirmedPublisher(
+      self.parameters, routing_key, bodies, properties, window, retries, self._queue_arguments(), backoff_factor)
+    confirmed = publisher.run()
+
+    return [message for index, message in enumerate(messages) if index in confirmed]
+
+  def consume(self, callback, routing_key, model, prefetch_count = 1, workers = None):
+    routing_key = str(routing_key)
+
+    connection = self._connect()
     channel = connection.channel()
 
-    channel.queue_declare(queue = routing_key, durable = True)
-    channel.basic_qos(prefetch_count = 1)
+    channel.queue_declare(queue = routing_key, durable = True, arguments = self._queue_arguments())
+    channel.basic_qos(prefetch_count = prefetch_count if workers is None else max(prefetch_count, workers))
 
-    channel.basic_consume(queue = routing_key, on_message_callback = self._wrap_callback(callback, model))
-    channel.start_consuming()
+    self._start_consuming(connection, channel, routing_key, callback, model, workers)
 
 
 class EventQueue(Queue):
   def publish(self, message, routing_key):
     routing_key = str(routing_key)
+    bodies, properties = self._encode_messages([message])
 
-    connection = pika.BlockingConnection(self.parameters)
-    channel = connection.channel()
+    pool = self._get_pool()
 
-    channel.exchange_declare(exchange = 'event', exchange_type = 'direct')
+    def declare_exchange(channel):
+      channel.exchange_declare(exchange = 'event', exchange_type = 'direct')
+
+    def publish_message(channel):
+      pool.declare(channel, ('exchange', 'event'), declare_exchange)
 
-    channel.basic_publish(
-      exchange = 'event',
-      routing_key = routing_key,
-      body = message.json())
+      channel.basic_publish(
+        exchange = 'event',
+        routing_key = routing_key,
+        body = bodies[0],
+        properties = properties)
 
-    connection.close()
+    pool.run(publish_message)
 
-  def consume(self, callback, routing_key, model):
+  def consume(self, callback, routing_key, model, workers = None):
     routing_key = str(routing_key)
 
-    connection = pika.BlockingConnection(self.parameters)
+    connection = self._connect()
     channel = connection.channel()
 
     channel.exchange_declare(exchange = 'event', exchange_type = 'direct')
@@ -90,9 +560,4 @@ class EventQueue(Queue):
 
     channel.queue_bind(exchange = 'event', queue = queue_name, routing_key = routing_key)
 
-    channel.basic_consume(
-      queue = queue_name,
-      on_message_callback = self._wrap_callback(callback, model),
-      auto_ack = True)
-
-    channel.start_consuming()
+    self._start_consuming(connection, channel, queue_name, callback, model, workers, auto_ack = True)
@@ -0,0 +1,143 @@
+from collections import deque
+from threading import Lock
+
+
+class Scheduler:
+  def __init__(self, work_queue):
+    self.work_queue = work_queue
+
+    self.jobs = {}
+    self.owners = deque()
+    self.owner_jobs = {}
+    self.deficits = {}
+
+    self.lock = Lock()
+
+  def _weight(self, owner):
+    return 1 + max(self.jobs[job_id]['priority'] for job_id in self.owner_jobs[owner])
+
+  def _remove_job(self, job_id):
+    job = self.jobs.pop(job_id)
+    owner = job['owner']
+
+    self.owner_jobs[owner].remove(job_id)
+
+    if len(self.owner_jobs[owner]) == 0:
+      self.owners.remove(owner)
+
+      del self.owner_jobs[owner]
+      del self.deficits[owner]
+
+  def _add_job(self, job_id, job):
+    owner = job['owner']
+
+    self.jobs[job_id] = job
+
+    if owner not in self.owner_jobs:
+      self.owners.append(owner)
+      self.owner_jobs[owner] = deque()
+      self.deficits[owner] = 0
+
+    self.owner_jobs[owner].append(job_id)
+
+  def submit(self, job_id, messages, routing_key, priority = 0, owner = None):
+    job_id = str(job_id)
+    owner = job_id if owner is None else str(owner)
+
+    with self.lock:
+      if job_id in self.jobs:
+        self.jobs[job_id]['messages'].extend(messages)
+        return
+
+      self._add_job(job_id, {
+        'owner': owner,
+        'routing_key': str(routing_key),
+        'priority': priority,
+        'messages': deque(messages),
+        'cancelled': False
+      })
+
+      if len(self.jobs[job_id]['messages']) == 0:
+        self._remove_job(job_id)
+
+  def cancel(self, job_id):
+    with self.lock:
+      if str(job_id) in self.jobs:
+        self.jobs[str(job_id)]['cancelled'] = True
+        self._remove_job(str(job_id))
+
+  def pending_count(self, job_id = None):
+    with self.lock:
+      if job_id is not None:
+        job = self.jobs.get(str(job_id))
+        return 0 if job is None else len(job['messages'])
+
+      return sum(len(job['messages']) for job in self.jobs.values())
+
+  def _restore(self, entries):
+    with self.lock:
+      for job_id, job, message in reversed(entries):
+        if job['cancelled']:
+          continue
+
+        if job_id not in self.jobs:
+          self._add_job(job_id, job)
+
+        self.jobs[job_id]['messages'].appendleft(message)
+
+  def _next_entries(self, size):
+    batch = []
+
+    with self.lock:
+      while len(batch) < size and len(self.owners) > 0:
+        owner = self.owners[0]
+        jobs = self.owner_jobs[owner]
+
+        if self.deficits[owner] < 1:
+          self.deficits[owner] += self._weight(owner)
+
+        while self.deficits[owner] >= 1 and len(batch) < size:
+          job_id = jobs[0]
+          job = self.jobs[job_id]
+
+          batch.append((job_id, job, job['messages'].popleft()))
+          self.deficits[owner] -= 1
+
+          jobs.rotate(-1)
+
+          if len(job['messages']) == 0:
+            self._remove_job(job_id)
+
+            if owner not in self.owner_jobs:
+              break
+
+        if owner in self.owner_jobs and self.deficits[owner] < 1:
+          self.owners.rotate(-1)
+
+    return batch
+
+  def next_batch(self, size):
+    return [(job['routing_key'], job['priority'], message) for _, job, message in self._next_entries(size)]
+
+  def dispatch(self, size):
+    batch = self._next_entries(size)
+
+    groups = []
+
+    for entry in batch:
+      _, job, _ = entry
+      key = (job['routing_key'], job['priority'])
+
+      if len(groups) > 0 and groups[-1][0] == key:
+        groups[-1][1].append(entry)
+      else:
+        groups.append((key, [entry]))
+
+    for index, ((routing_key, priority), entries) in enumerate(groups):
+      try:
+        self.work_queue.publish([message for _, _, message in entries], routing_key, priority)
+      except:
+        self._restore([entry for _, group_entries in groups[index:] for entry in group_entries])
+        raise
+
+    return len(batch)
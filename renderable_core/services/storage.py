@@ -1,7 +1,67 @@
 import json
+import hashlib
 from io import BytesIO
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+from collections import deque
+from contextlib import nullcontext
+from itertools import islice
+from threading import Semaphore
+from concurrent.futures import ThreadPoolExecutor
 
 import minio
+from minio.datatypes import Part
+from minio.deleteobjects import DeleteObject
+
+from .. import utils
+
+
+class StreamReader:
+  def __init__(self, data):
+    self.file = data if hasattr(data, 'read') else None
+    self.iterator = None if hasattr(data, 'read') else iter(data)
+
+    self.buffer = b''
+    self.size = 0
+
+    self.md5 = hashlib.md5()
+    self.sha256 = hashlib.sha256()
+
+  def _read_source(self, size):
+    if self.file is not None:
+      return self.file.read(size)
+
+    for chunk in self.iterator:
+      if len(chunk) > 0:
+        return chunk
+
+    return b''
+
+  def read(self, size = -1):
+    chunks = [self.buffer]
+    buffered_size = len(self.buffer)
+
+    while size < 0 or buffered_size < size:
+      chunk = self._read_source(size - buffered_size if size > 0 else -1)
+
+      if len(chunk) == 0:
+        break
+
+      chunks.append(chunk)
+      buffered_size += len(chunk)
+
+    data = b''.join(chunks)
+
+    if size >= 0:
+      data, self.buffer = data[:size], data[size:]
+    else:
+      self.buffer = b''
+
+    self.size += len(data)
+    self.md5.update(data)
+    self.sha256.update(data)
+
+    return data
 
 
 class Storage:
@@ -37,38 +97,150 @@ class Storage:
         self.client.make_bucket(bucket_name)
         self.client.set_bucket_policy(bucket_name, json.dumps(policy))
 
+  def _format_object(self, object_info):
+    return {
+      'bucket_name': object_info.bucket_name,
+      'object_name': object_info.object_name,
+      'resource_url': f'{self.base_url}/{object_info.bucket_name}/{object_info.object_name}'
+    }
+
+  def iter_find(self, bucket_name, object_name_prefix, start_after = None):
+    objects = self.client.list_objects(
+      bucket_name, object_name_prefix, recursive = True, start_after = start_after)
+
+    yield from map(self._format_object, objects)
+
+  def find_pages(self, bucket_name, object_name_prefix, page_size = 1000, start_after = None):
+    results = self.iter_find(bucket_name, object_name_prefix, start_after)
+
+    while True:
+      page = list(islice(results, page_size))
+
+      if len(page) == 0:
+        return
+
+      yield page
+
   def find(self, bucket_name, object_name_prefix):
-    def format_object(object_info):
-      return {
-        'bucket_name': object_info.bucket_name,
-        'object_name': object_info.object_name,
-        'resource_url': f'{self.base_url}/{object_info.bucket_name}/{object_info.object_name}'
-      }
+    return list(self.iter_find(bucket_name, object_name_prefix))
+
+  def _upload_parts(self, reader, part, content_type, bucket_name, object_name, part_size, workers):
+    headers = {'Content-Type': content_type}
+
+    upload_id = self.client._create_multipart_upload(bucket_name, object_name, headers)
+
+    try:
+      pending_parts = Semaphore(workers * 2)
+      failed_parts = []
+
+      def on_part_done(future):
+        if not future.cancelled() and future.exception() is not None:
+          failed_parts.append(future)
+
+        pending_parts.release()
+
+      with ThreadPoolExecutor(max_workers = workers) as executor:
+        futures = []
+
+        while len(part) > 0:
+          pending_parts.acquire()
+
+          if len(failed_parts) > 0:
+            for future in futures:
+              future.cancel()
+
+            failed_parts[0].result()
 
-    objects = self.client.list_objects(bucket_name, object_name_prefix, recursive = True)
-    results = list(map(format_object, objects))
+          future = executor.submit(
+            self.client._upload_part, bucket_name, object_name, part, None, upload_id, len(futures) + 1)
+          future.add_done_callback(on_part_done)
 
-    return results
+          futures.append(future)
 
-  def upload(self, data, content_type, bucket_name, object_name):
-    size = len(data.read())
-    data.seek(0)
+          part = reader.read(part_size)
+
+        parts = [Part(index + 1, future.result()) for index, future in enumerate(futures)]
+
+      self.client._complete_multipart_upload(bucket_name, object_name, upload_id, parts)
+    except:
+      self.client._abort_multipart_upload(bucket_name, object_name, upload_id)
+      raise
+
+  def upload(self, data, content_type, bucket_name, object_name, part_size = 16 * 1024 * 1024, workers = 4):
+    reader = StreamReader(data)
+    part = reader.read(part_size)
 
     resource_url = f'{self.base_url}/{bucket_name}/{object_name}'
 
-    self.client.put_object(bucket_name, object_name, data, size, content_type)
+    if len(part) < part_size:
+      self.client.put_object(bucket_name, object_name, BytesIO(part), len(part), content_type)
+    else:
+      self._upload_parts(reader, part, content_type, bucket_name, object_name, part_size, workers)
 
     result = {
       'bucket_name': bucket_name,
       'object_name': object_name,
-      'resource_url': resource_url
+      'resource_url': resource_url,
+      'size': reader.size,
+      'md5': reader.md5.hexdigest(),
+      'sha256': reader.sha256.hexdigest()
     }
 
     return result
 
+  def _chunk_object_name(self, digest):
+    return f'chunks/{digest}'
+
+  def find_missing_chunks(self, digests, workers = 8):
+    def exists(digest):
+      try:
+        self.client.stat_object('scenes', self._chunk_object_name(digest))
+      except minio.error.S3Error as error:
+        if error.code in ['NoSuchKey', 'NoSuchObject']:
+          return False
+
+        raise error
+
+      return True
+
+    digests = list(dict.fromkeys(digests))
+
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+      found = list(executor.map(exists, digests))
+
+    return [digest for digest, exists in zip(digests, found) if not exists]
+
+  def upload_chunk(self, digest, data):
+    if hashlib.sha256(data).hexdigest() != digest:
+      raise ValueError('invalid chunk digest')
+
+    return self.upload(BytesIO(data), 'application/octet-stream', 'scenes', self._chunk_object_name(digest))
+
+  def upload_manifest(self, manifest, object_name):
+    data = BytesIO(json.dumps(manifest).encode())
+
+    return self.upload(data, 'application/json', 'scenes', f'manifests/{object_name}.json')
+
+  def download_manifest(self, object_name):
+    result = self.download('scenes', f'manifests/{object_name}.json')
+
+    return json.loads(result['data'].getvalue())
+
+  def assemble_chunks(self, manifest, content_type, bucket_name, object_name):
+    def read_chunks():
+      for chunk in manifest:
+        yield from self.stream('scenes', self._chunk_object_name(chunk['digest']))
+
+    return self.upload(read_chunks(), content_type, bucket_name, object_name)
+
   def download(self, bucket_name, object_name):
     response = self.client.get_object(bucket_name, object_name)
-    data = BytesIO(response.data)
+
+    try:
+      data = BytesIO(response.read())
+    finally:
+      response.close()
+      response.release_conn()
 
     result = {
       'bucket_name': bucket_name,
@@ -78,6 +250,85 @@ class Storage:
 
     return result
 
+  def stream(self, bucket_name, object_name, offset = 0, length = 0, chunk_size = 1024 * 1024):
+    response = self.client.get_object(bucket_name, object_name, offset = offset, length = length)
+
+    try:
+      yield from response.stream(chunk_size)
+    finally:
+      response.close()
+      response.release_conn()
+
+  def download_to(self, destination, bucket_name, object_name, offset = 0, length = 0, chunk_size = 1024 * 1024):
+    if isinstance(destination, int):
+      file_context = open(destination, 'wb', closefd = False)
+    elif hasattr(destination, 'write'):
+      file_context = nullcontext(destination)
+    else:
+      file_context = open(destination, 'wb')
+
+    size = 0
+
+    with file_context as file:
+      for chunk in self.stream(bucket_name, object_name, offset, length, chunk_size):
+        file.write(chunk)
+        size += len(chunk)
+
+    result = {
+      'bucket_name': bucket_name,
+      'object_name': object_name,
+      'size': size
+    }
+
+    return result
+
+  def _download_to_temporary_file(self, bucket_name, object_name, max_memory_size):
+    file = SpooledTemporaryFile(max_size = max_memory_size)
+
+    try:
+      self.download_to(file, bucket_name, object_name)
+      file.seek(0)
+    except:
+      file.close()
+      raise
+
+    return file
+
+  def archive(self, bucket_name, object_names, archive_bucket_name, archive_object_name,
+      workers = 4, max_memory_size = 64 * 1024 * 1024, chunk_size = 1024 * 1024):
+    def close_file(future):
+      if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+    def read_file(file):
+      with file:
+        yield from iter(lambda: file.read(chunk_size), b'')
+
+    def fetch_files():
+      pending_files = deque()
+
+      with ThreadPoolExecutor(max_workers = workers) as executor:
+        try:
+          for object_name in object_names:
+            future = executor.submit(self._download_to_temporary_file, bucket_name, object_name, max_memory_size)
+            pending_files.append((object_name, future))
+
+            if len(pending_files) > workers:
+              object_name, future = pending_files.popleft()
+              yield Path(object_name).name, read_file(future.result())
+
+          while len(pending_files) > 0:
+            object_name, future = pending_files.popleft()
+            yield Path(object_name).name, read_file(future.result())
+        finally:
+          for _, future in pending_files:
+            future.cancel()
+            future.add_done_callback(close_file)
+
+    data = utils.stream_archive(fetch_files())
+
+    return self.upload(data, 'application/zip', archive_bucket_name, archive_object_name, workers = workers)
+
   def remove(self, bucket_name, object_name):
     resource_url = f'{self.base_url}/{bucket_name}/{object_name}'
 
@@ -90,3 +341,42 @@ class Storage:
     }
 
     return result
+
+  def remove_many(self, bucket_name, object_names, batch_size = 1000):
+    object_names = iter(object_names)
+
+    removed = []
+    errors = []
+
+    while True:
+      batch = list(islice(object_names, batch_size))
+
+      if len(batch) == 0:
+        break
+
+      delete_objects = [DeleteObject(object_name) for object_name in batch]
+      delete_errors = {error.name: error for error in self.client.remove_objects(bucket_name, delete_objects)}
+
+      for object_name in batch:
+        error = delete_errors.get(object_name)
+
+        if error is None:
+          removed.append({
+            'bucket_name': bucket_name,
+            'object_name': object_name,
+            'resource_url': f'{self.base_url}/{bucket_name}/{object_name}'
+          })
+        else:
+          errors.append({
+            'bucket_name': bucket_name,
+            'object_name': object_name,
+            'code': error.code,
+            'message': error.message
+          })
+
+    result = {
+      'removed': removed,
+      'errors': errors
+    }
+
+    return result
@@ -0,0 +1,118 @@
+import time
+from threading import Thread, Condition, RLock
+
+import requests
+
+
+class TaskStateBuffer:
+  def __init__(self, client, max_size = 100, flush_interval = 1.0, callback = None, error_callback = None):
+    self.client = client
+    self.max_size = max_size
+    self.flush_interval = flush_interval
+    self.callback = callback
+    self.error_callback = error_callback
+
+    self.transitions = {}
+    self.first_added_at = None
+    self.closed = False
+    self.failure_count = 0
+
+    self.condition = Condition()
+    self.send_lock = RLock()
+
+    flush_thread = Thread(target = self._flush_periodically, daemon = True)
+    flush_thread.start()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exception_type, exception_value, traceback):
+    self.close()
+
+  def _take_transitions(self):
+    transitions = self.transitions
+
+    self.transitions = {}
+    self.first_added_at = None
+
+    return transitions
+
+  def _restore_transitions(self, transitions):
+    with self.condition:
+      for id, state in transitions.items():
+        self.transitions.setdefault(id, state)
+
+      if len(self.transitions) > 0 and self.first_added_at is None:
+        self.first_added_at = time.monotonic()
+
+  def _send(self, transitions):
+    if len(transitions) == 0:
+      return []
+
+    try:
+      results = self.client.update_task_states(transitions.items())
+    except:
+      self._restore_transitions(transitions)
+      raise
+
+    if self.callback is not None:
+      self.callback(results)
+
+    return results
+
+  def _flush_periodically(self):
+    while True:
+      with self.condition:
+        while not self.closed and self.first_added_at is None:
+          self.condition.wait()
+
+        if self.closed:
+          return
+
+        remaining_time = self.first_added_at + self.flush_interval - time.monotonic()
+
+        if remaining_time > 0:
+          self.condition.wait(remaining_time)
+          continue
+
+      try:
+        self.flush()
+      except requests.RequestException as error:
+        with self.condition:
+          self.failure_count += 1
+
+        if self.error_callback is not None:
+          self.error_callback(error)
+
+        time.sleep(self.flush_interval)
+
+  def add(self, task_id, state):
+    with self.condition:
+      if self.closed:
+        raise RuntimeError('buffer is closed')
+
+      self.transitions.pop(str(task_id), None)
+      self.transitions[str(task_id)] = state
+
+      if self.first_added_at is None:
+        self.first_added_at = time.monotonic()
+        self.condition.notify_all()
+
+      if len(self.transitions) < self.max_size:
+        return []
+
+    return self.flush()
+
+  def flush(self):
+    with self.send_lock:
+      with self.condition:
+        transitions = self._take_transitions()
+
+      return self._send(transitions)
+
+  def close(self):
+    with self.condition:
+      self.closed = True
+      self.condition.notify_all()
+
+    return self.flush()
@@ -8,6 +8,10 @@ from functools import partial
 import numpy as np
 from tabulate import tabulate
 
+from .multipart import MultipartEncoder
+from .chunking import content_defined_chunks
+from .archive import stream_archive
+
 
 def utc_now():
   return datetime.datetime.now(datetime.timezone.utc)
@@ -79,13 +83,20 @@ def group_frames(start, end, parallelism):
 
   return [group.tolist() for group in groups]
 
-def job_statistics(jobs):
+def job_statistics(jobs, task_counts = None):
   def filter_by_state(job):
     return job.state == 'done' or job.state == 'error'
 
   def format_job(job):
-    task_count = len(job.tasks)
-    completed_count = len(list(filter(filter_by_state, job.tasks)))
+    if task_counts is None:
+      task_count = len(job.tasks)
+      completed_count = len(list(filter(filter_by_state, job.tasks)))
+    else:
+      counts = task_counts.get(job.id, task_counts.get(str(job.id), {}))
+
+      task_count = sum(counts.values())
+      completed_count = counts.get('done', 0) + counts.get('error', 0)
+
     completed_percentage = completed_count / task_count * 100 if task_count > 0 else 0
 
     progress = f'{completed_percentage:.2f}%'
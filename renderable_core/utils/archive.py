@@ -0,0 +1,58 @@
+from pathlib import Path
+from zipfile import ZipFile, ZipInfo, ZIP_STORED, ZIP_DEFLATED
+
+
+COMPRESSED_EXTENSIONS = [
+  '.exr', '.png', '.jpg', '.jpeg', '.webp', '.gif', '.jp2',
+  '.mp4', '.mov', '.mkv', '.avi', '.zip', '.gz', '.bz2', '.xz', '.7z'
+]
+
+
+class ArchiveBuffer:
+  def __init__(self):
+    self.chunks = []
+    self.position = 0
+
+  def write(self, data):
+    self.chunks.append(bytes(data))
+    self.position += len(data)
+
+    return len(data)
+
+  def tell(self):
+    return self.position
+
+  def flush(self):
+    pass
+
+  def drain(self):
+    data = b''.join(self.chunks)
+    self.chunks = []
+
+    return data
+
+
+def stream_archive(files):
+  buffer = ArchiveBuffer()
+
+  with ZipFile(buffer, 'w') as zip_file:
+    for filename, chunks in files:
+      metadata = ZipInfo(filename)
+
+      if Path(filename).suffix.lower() in COMPRESSED_EXTENSIONS:
+        metadata.compress_type = ZIP_STORED
+      else:
+        metadata.compress_type = ZIP_DEFLATED
+
+      with zip_file.open(metadata, 'w', force_zip64 = True) as entry:
+        for chunk in chunks:
+          entry.write(chunk)
+
+          if len(buffer.chunks) > 0:
+            yield buffer.drain()
+
+      if len(buffer.chunks) > 0:
+        yield buffer.drain()
+
+  if len(buffer.chunks) > 0:
+    yield buffer.drain()
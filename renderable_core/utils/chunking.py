@@ -0,0 +1,69 @@
+import hashlib
+
+import numpy as np
+
+
+WINDOW_SIZE = 32
+
+GEAR_TABLE = np.random.RandomState(0x5eed).randint(0, 2 ** 32, 256, dtype = np.uint64).astype(np.uint32)
+
+
+def _rolling_hashes(data):
+  hashes = GEAR_TABLE[data]
+  width = 1
+
+  while width < WINDOW_SIZE:
+    rotated = (hashes << np.uint32(width)) | (hashes >> np.uint32(32 - width))
+
+    hashes = hashes.copy()
+    hashes[width:] ^= rotated[:len(data) - width]
+
+    width *= 2
+
+  return hashes
+
+def content_defined_chunks(file, min_size = 256 * 1024, average_size = 1024 * 1024,
+    max_size = 4 * 1024 * 1024, block_size = 16 * 1024 * 1024):
+  mask_bits = max(average_size - min_size, 1).bit_length() - 1
+  mask = np.uint32((1 << mask_bits) - 1)
+
+  pending = b''
+  offset = 0
+
+  while True:
+    block = file.read(block_size)
+    end_of_file = len(block) == 0
+
+    data = pending + block
+
+    if len(data) == 0:
+      return
+
+    hashes = _rolling_hashes(np.frombuffer(data, dtype = np.uint8))
+    candidates = np.flatnonzero((hashes & mask) == 0)
+
+    start = 0
+
+    while start < len(data):
+      index = np.searchsorted(candidates, start + min_size - 1)
+
+      if index < len(candidates) and candidates[index] < start + max_size:
+        end = int(candidates[index]) + 1
+      elif len(data) - start >= max_size:
+        end = start + max_size
+      elif end_of_file:
+        end = len(data)
+      else:
+        break
+
+      chunk = data[start:end]
+
+      yield offset, hashlib.sha256(chunk).hexdigest(), chunk
+
+      offset += len(chunk)
+      start = end
+
+    pending = data[start:]
+
+    if end_of_file:
+      return
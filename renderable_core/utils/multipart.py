@@ -0,0 +1,101 @@
+import os
+import uuid
+import mimetypes
+
+
+class MultipartEncoder:
+  def __init__(self, fields, boundary = None, progress_callback = None):
+    self.boundary = uuid.uuid4().hex if boundary is None else boundary
+    self.progress_callback = progress_callback
+
+    self.content_type = f'multipart/form-data; boundary={self.boundary}'
+
+    self.parts = []
+
+    for name, value in fields:
+      if isinstance(value, tuple):
+        filename, file = value[:2]
+        content_type = value[2] if len(value) > 2 else None
+
+        self._add_file(name, filename, file, content_type)
+      else:
+        self._add_field(name, value)
+
+    self.parts.append(f'--{self.boundary}--\r\n'.encode())
+
+    self.length = sum(self._part_length(part) for part in self.parts)
+    self.bytes_read = 0
+    self.part_index = 0
+
+  def __len__(self):
+    return self.length
+
+  def __iter__(self):
+    while True:
+      chunk = self.read(64 * 1024)
+
+      if len(chunk) == 0:
+        return
+
+      yield chunk
+
+  def _add_field(self, name, value):
+    if isinstance(value, str):
+      value = value.encode()
+
+    header = f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+
+    self.parts.append(header.encode() + value + b'\r\n')
+
+  def _add_file(self, name, filename, file, content_type):
+    if content_type is None:
+      content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    header = f'--{self.boundary}\r\n' \
+      f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n' \
+      f'Content-Type: {content_type}\r\n\r\n'
+
+    self.parts.append(header.encode())
+    self.parts.append(file)
+    self.parts.append(b'\r\n')
+
+  def _part_length(self, part):
+    if isinstance(part, bytes):
+      return len(part)
+
+    return os.fstat(part.fileno()).st_size - part.tell()
+
+  def read(self, size = -1):
+    chunks = []
+    remaining_size = size
+
+    while self.part_index < len(self.parts) and remaining_size != 0:
+      part = self.parts[self.part_index]
+
+      if isinstance(part, bytes):
+        chunk = part[:remaining_size] if remaining_size > 0 else part
+        rest = part[len(chunk):]
+
+        if len(rest) > 0:
+          self.parts[self.part_index] = rest
+        else:
+          self.part_index += 1
+      else:
+        chunk = part.read(remaining_size)
+
+        if len(chunk) == 0 or remaining_size < 0:
+          self.part_index += 1
+
+      chunks.append(chunk)
+
+      if remaining_size > 0:
+        remaining_size -= len(chunk)
+
+    data = b''.join(chunks)
+
+    self.bytes_read += len(data)
+
+    if self.progress_callback is not None and len(data) > 0:
+      self.progress_callback(self.bytes_read, self.length)
+
+    return data
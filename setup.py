@@ -15,14 +15,22 @@ requirements = [
   'tabulate>=0.8.7',
   'psutil>=5.7.0',
   'requests>=2.25.0',
+  'aiohttp>=3.7.0',
   'websockets>=8.0',
   'pydantic>=1.7.0',
   'docker>=4.3.0',
   'pymongo>=3.11.0',
-  'minio>=6.0.0',
+  'minio>=7.1.0',
   'pika>=1.1.0'
 ]
 
+extra_requirements = {
+  'fast': [
+    'orjson>=3.4.0',
+    'msgpack>=1.0.0'
+  ]
+}
+
 setup(
   name = package_name,
   version = package_info['__version__'],
@@ -32,5 +40,6 @@ setup(
   license = package_info['__license__'],
   python_requires = '>=3.7.0',
   install_requires = requirements,
+  extras_require = extra_requirements,
   packages = find_packages(),
   zip_safe = False)